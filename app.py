@@ -1,18 +1,27 @@
 from fastapi import FastAPI
 from fastapi.concurrency import asynccontextmanager
 from backend.utils.db_conn import conn
+from backend.workers.grading_worker import grading_workers
+from backend.utils.pdf_extractor import shutdown_pool
+from backend.rag_models.clients import clients
 from backend.routes.user_router import user_router
 from backend.routes.exam_router import exam_router
 from backend.routes.student_router import student_router
 from backend.routes.answer_router import answer_router
 from backend.routes.context_router import context_router
+from backend.routes.metrics_router import metrics_router
 
 def authorization_service_startup():
     print("Starting up -- Authorization server!!")
     conn.setup_server()
+    clients.setup()
+    grading_workers.start()
 
 def authorization_service_shutdown():
     print("Shutting down -- Authorization server!!")
+    grading_workers.stop()
+    shutdown_pool()
+    clients.close()
     conn.close_all_connections()
 
 @asynccontextmanager
@@ -31,4 +40,5 @@ server.include_router(user_router, prefix="/quick-score/users")
 server.include_router(exam_router, prefix="/quick-score/exams")
 server.include_router(student_router, prefix="/quick-score/students")
 server.include_router(answer_router, prefix="/quick-score/answers")
-server.include_router(context_router, prefix="/quick-score/context")
\ No newline at end of file
+server.include_router(context_router, prefix="/quick-score/context")
+server.include_router(metrics_router, prefix="/quick-score/metrics")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional, Tuple
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,32 +6,148 @@ class Settings(BaseSettings):
     Pydantic model for environment configuration.
     
     Attributes:
+    DB_BACKEND (str): "sqlite" or "postgresql".
+    LIST_PAGE_SIZE (int): Items returned by a list endpoint when no limit is given.
+    LIST_MAX_PAGE_SIZE (int): Largest limit a list endpoint accepts.
+    SQLITE_PATH (str): Database file used by the sqlite backend.
+    SQLITE_TUNING (bool): Apply the SQLITE_* pragmas below to every sqlite connection.
+    SQLITE_JOURNAL_MODE (str): Journal mode, WAL lets readers run alongside the single writer.
+    SQLITE_SYNCHRONOUS (str): NORMAL only syncs the WAL at checkpoints, which is safe in WAL mode.
+    SQLITE_BUSY_TIMEOUT_MS (int): How long a write waits for the database lock before failing.
+    SQLITE_MMAP_SIZE (int): Bytes of the database file read through a memory map.
     DB_HOST (str, optional): Database host.
     DB_PORT (int, optional): Database port.
     DB_USERNAME (str, optional): Database username.
     DB_PASSWORD (str, optional): Database password.
     DB_DATABASE (str, optional): Database name.
+    DB_POOL_SIZE (int): Connections kept open in the pool.
+    DB_MAX_OVERFLOW (int): Extra connections opened when the pool is exhausted.
+    DB_POOL_TIMEOUT (int): Seconds a checkout waits for a free connection before failing.
+    DB_POOL_RECYCLE (int): Seconds after which a pooled connection is replaced.
+    DB_POOL_PRE_PING (bool): Test a pooled connection before handing it out.
 
     SECRET_KEY (str, optional): Secret key for the application.
     COHERE_API_KEY (str, optional): API key for Cohere.
     WEAVIATE_API_KEY (str, optional): API key for Weaviate.
     WEAVIATE_URL (str, optional): URL for Weaviate.
+
+    GRADER_MAX_WORKERS (int): Maximum number of questions graded concurrently.
+    BATCH_MAX_WORKERS (int): Maximum number of answer scripts graded concurrently in a batch upload.
+    GRADER_BATCH_SIZE (int): Questions graded per LLM prompt, 1 sends one prompt per question.
+    GRADER_MAX_RETRIES (int): Extra attempts for a question whose grader reply cannot be parsed.
+    GRADER_RETRY_BUDGET (int): Extra attempts shared by all questions of one answer script.
+    PRECOMPUTE_EXAM_CONTEXT (bool): Retrieve the context passages of every answer-key question when an exam is created.
+    SPLIT_CACHE_ENABLED (bool): Reuse stored QuestionSplitter output for previously split documents.
+    SPLIT_CACHE_MAX_ENTRIES (int): Split cache size, least recently used entries are evicted beyond it.
+    SPLIT_CACHE_EVICT_INTERVAL (int): Split cache puts between two evictions.
+    SPLIT_RULES_MIN_CONFIDENCE (float): Rule based splits below this confidence fall back to the LLM.
+    GRADE_CACHE_ENABLED (bool): Reuse stored grades for previously graded answers.
+    GRADE_CACHE_MAX_ENTRIES (int): Grade cache size, least recently used entries are evicted beyond it.
+    GRADE_CACHE_EVICT_INTERVAL (int): Grade cache puts between two evictions.
+    GRADE_CACHE_TTL_SECONDS (int): Age after which a cached grade is discarded, 0 keeps grades forever.
+    VECTOR_CHUNK_CONFIGS (List[Tuple[int, int]]): (chunk_size, chunk_overlap) pairs a reference context is chunked into.
+    EMBED_BATCH_SIZE (int): Chunks sent to the embedding model per request.
+    EMBED_CONCURRENCY (int): Embedding requests (and Weaviate import workers) running at once.
+    WEAVIATE_BATCH_SIZE (int): Objects per Weaviate batch import request.
+    EMBED_CACHE_DIR (str): Directory of the on-disk chunk embedding cache.
+    EMBED_CACHE_MAX_ENTRIES (int): Vectors kept per embedding model, the oldest are dropped beyond it.
+    VECTOR_BACKEND (str): Where reference contexts are stored and searched, "weaviate" or "local".
+    LOCAL_VECTOR_DIR (str): Directory of the local vector backend, one sub-directory per context.
+    CONTEXT_LOCK_DIR (str): Directory of the lock files serializing creates and deletes of contexts with the same content.
+    LOCAL_IVF_MIN_VECTORS (int): Local contexts with at least this many chunks get an IVF index.
+    LOCAL_IVF_NPROBE (int): IVF clusters scanned per query.
+    CLIENT_POOL_CONNECTIONS (int): Keep-alive connection pools held by the shared Weaviate client.
+    CLIENT_POOL_MAXSIZE (int): Connections kept alive per pool by the shared Weaviate client.
+    COHERE_REQUESTS_PER_MINUTE (int): Cohere calls allowed per minute across every process sharing COHERE_LIMITER_STATE_FILE.
+    COHERE_TOKENS_PER_MINUTE (int): Estimated prompt tokens allowed per minute across every process sharing COHERE_LIMITER_STATE_FILE.
+    COHERE_LIMITER_STATE_FILE (str): File holding the shared Cohere rate buckets, empty keeps them per process.
+    COHERE_MAX_CONCURRENCY (int): Upper bound of the adaptive number of Cohere calls in flight per process.
+    COHERE_MAX_RETRIES (int): Retries of a Cohere call answered with 429 or 5xx.
+    COHERE_BACKOFF_BASE (float): Backoff in seconds before the first retry, doubled on every retry.
+    COHERE_BACKOFF_MAX (float): Longest backoff in seconds between retries.
+    GRADING_WORKERS (int): Number of worker processes consuming the grading job queue.
+    GRADING_POLL_INTERVAL (float): Seconds an idle worker waits before polling the queue again.
+    GRADING_JOB_DIR (str): Directory where uploaded answer scripts wait for a worker.
+    GRADING_JOB_MAX_ATTEMPTS (int): Times a job is run before it is marked failed and its script removed.
+    UPLOAD_CHUNK_SIZE (int): Bytes read from an upload at a time.
+    UPLOAD_SPOOL_MAX_MEMORY (int): Uploads larger than this are spooled to a temporary file on disk.
+    PDF_EXTRACT_WORKERS (int): Number of processes extracting PDF pages in parallel.
+    PDF_PARALLEL_MIN_PAGES (int): Documents with fewer pages are extracted in the calling process.
     """
 
+    DB_BACKEND: str = "sqlite"
+    LIST_PAGE_SIZE: int = 50
+    LIST_MAX_PAGE_SIZE: int = 500
+    SQLITE_PATH: str = "mydatabase.db"
+    SQLITE_TUNING: bool = True
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456
     DB_HOST: Optional[str] = None
     DB_PORT: Optional[int] = None
     DB_USERNAME: Optional[str] = None
     DB_PASSWORD: Optional[str] = None
     DB_DATABASE: Optional[str] = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
 
     SECRET_KEY: Optional[str] = None
     COHERE_API_KEY: Optional[str] = None
     WEAVIATE_API_KEY: Optional[str] = None
     WEAVIATE_URL: Optional[str] = None
 
+    GRADER_MAX_WORKERS: int = 4
+    BATCH_MAX_WORKERS: int = 4
+    GRADER_BATCH_SIZE: int = 1
+    GRADER_MAX_RETRIES: int = 2
+    GRADER_RETRY_BUDGET: int = 10
+    PRECOMPUTE_EXAM_CONTEXT: bool = True
+    SPLIT_CACHE_ENABLED: bool = True
+    SPLIT_CACHE_MAX_ENTRIES: int = 5000
+    SPLIT_CACHE_EVICT_INTERVAL: int = 100
+    SPLIT_RULES_MIN_CONFIDENCE: float = 0.8
+    GRADE_CACHE_ENABLED: bool = True
+    GRADE_CACHE_MAX_ENTRIES: int = 50000
+    GRADE_CACHE_EVICT_INTERVAL: int = 500
+    GRADE_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    VECTOR_CHUNK_CONFIGS: List[Tuple[int, int]] = [(1024, 0), (1024, 200), (512, 100), (256, 50), (128, 25)]
+    EMBED_BATCH_SIZE: int = 96
+    EMBED_CONCURRENCY: int = 4
+    WEAVIATE_BATCH_SIZE: int = 100
+    EMBED_CACHE_DIR: str = "./embedding_cache"
+    EMBED_CACHE_MAX_ENTRIES: int = 200000
+    VECTOR_BACKEND: str = "weaviate"
+    LOCAL_VECTOR_DIR: str = "./vector_index"
+    CONTEXT_LOCK_DIR: str = "./context_locks"
+    LOCAL_IVF_MIN_VECTORS: int = 20000
+    LOCAL_IVF_NPROBE: int = 8
+    CLIENT_POOL_CONNECTIONS: int = 20
+    CLIENT_POOL_MAXSIZE: int = 100
+    COHERE_REQUESTS_PER_MINUTE: int = 100
+    COHERE_TOKENS_PER_MINUTE: int = 100000
+    COHERE_LIMITER_STATE_FILE: str = "./cohere_limiter.json"
+    COHERE_MAX_CONCURRENCY: int = 8
+    COHERE_MAX_RETRIES: int = 5
+    COHERE_BACKOFF_BASE: float = 1.0
+    COHERE_BACKOFF_MAX: float = 30.0
+    GRADING_WORKERS: int = 2
+    GRADING_POLL_INTERVAL: float = 1.0
+    GRADING_JOB_DIR: str = "./grading_jobs"
+    GRADING_JOB_MAX_ATTEMPTS: int = 3
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024
+    PDF_EXTRACT_WORKERS: int = 4
+    PDF_PARALLEL_MIN_PAGES: int = 8
+
     class Config:
         """
         Configuration for Pydantic model.
         This class is used to specify the location of the environment file.
         """
         env_file = "./backend/.env"
+
+config = Settings()
@@ -1,8 +1,14 @@
-from typing import Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Row
 
 from backend.utils.errors import BadRequestError, InternalServerError
 from backend.dao.answer_dao import AnswerDao
 from backend.dao.exam_dao import ExamDao
+from backend.dao.grade_cache_dao import GradeCacheDao
+from backend.dao.grading_batch_stats_dao import GradingBatchStatsDao
+from backend.dao.grading_checkpoint_dao import GradingCheckpointDao
 from backend.schemas.answer_schema import AnswerResponse, CreateAnswer, AnswerIndividualResponse
 from backend.config.config import config
 from backend.rag_models.question_splitter import QuestionSplitter
@@ -13,8 +19,9 @@ class AnswerCore:
     def __init__(self):
         self.answer_dao = AnswerDao()
         self.exam_dao = ExamDao()
+        self.grade_cache_dao = GradeCacheDao()
 
-    def create_answer(self, create_answer: CreateAnswer, answer_pdf: str, filename: str) -> Dict:
+    def create_answer(self, create_answer: CreateAnswer, answer_pdf: str, filename: str, progress_callback: Optional[Callable] = None) -> Dict:
         """
         Create an answer based on the provided details.
 
@@ -22,13 +29,14 @@ class AnswerCore:
             create_answer (CreateAnswer): The details of the answer to be created.
             answer_pdf (str): The PDF containing the answers.
             filename (str): The name of the file.
+            progress_callback (Optional[Callable]): Called as (index, total, graded) after each question is graded.
 
         Returns:
             Dict: The created answer response.
         """
         exam_details, context_key = self.get_exam_details(create_answer.exam_id)
         json_answer_list = self.process_answer_pdf(answer_pdf, exam_details["answer_key"])
-        evaluation_result, total_score = self.grade_answer(context_key, json_answer_list)
+        evaluation_result, total_score = self.grade_answer(context_key, json_answer_list, progress_callback, exam_id=create_answer.exam_id, retrieved_context=exam_details.get("retrieved_context"), student_id=create_answer.student_id)
 
         answer_result = self.answer_dao.create_answer(
             exam_id=create_answer.exam_id,
@@ -38,16 +46,72 @@ class AnswerCore:
             evaluation_details=evaluation_result,
             filename=filename
         )
-        answer, student = self.extract_answer_and_student(answer_result)
-        return self.create_answer_response(answer, student)
+        GradingCheckpointDao().delete_checkpoints(create_answer.exam_id, [create_answer.student_id])
+        return self.create_answer_response(answer_result)
+
+    def create_answers_batch(self, exam_id: int, scripts: List[Dict]) -> Dict:
+        """
+        Grade the answer scripts of a whole class for one exam.
+
+        The exam, answer key and grader (with its retriever) are loaded once and
+        shared by every script, scripts are graded on a worker pool and the
+        results are stored with a single bulk insert.
+
+        Args:
+            exam_id (int): The ID of the exam.
+            scripts (List[Dict]): One item per script with student_id, filename and answer_pdf.
 
-    def process_answer_pdf(self, answer_pdf: str, answer_key: List[Dict]) -> List[Dict]:
+        Returns:
+            Dict: The created answer responses and the scripts that could not be graded.
+        """
+        exam_details, context_key = self.get_exam_details(exam_id)
+        qs = QuestionSplitter()
+        cohere_grader = GraderCohere(context_key, exam_id=exam_id, retrieved_context=exam_details.get("retrieved_context"))
+
+        answers_to_create, failed = [], []
+        max_workers = max(1, min(config.BATCH_MAX_WORKERS, len(scripts)))
+        # the scripts share GRADER_MAX_WORKERS, so at most that many questions are graded at once
+        grader_workers = max(1, config.GRADER_MAX_WORKERS // max_workers)
+
+        def grade_script(script: Dict) -> Tuple[List[Dict], float]:
+            json_answer_list = self.process_answer_pdf(script["answer_pdf"], exam_details["answer_key"], qs=qs)
+            return self.grade_with_checkpoints(cohere_grader, json_answer_list, exam_id, script["student_id"], max_workers=grader_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(grade_script, script) for script in scripts]
+            for script, future in zip(scripts, futures):
+                try:
+                    evaluation_result, total_score = future.result()
+                except Exception as error:
+                    print(error)
+                    failed.append({"student_id": script["student_id"], "file_name": script["filename"], "message": str(error)})
+                    continue
+                answers_to_create.append({
+                    "exam_id": exam_id,
+                    "student_id": script["student_id"],
+                    "score": total_score,
+                    "confidence": 0.0,
+                    "evaluation_details": evaluation_result,
+                    "filename": script["filename"]
+                })
+        self.record_grading_stats(exam_id, cohere_grader)
+
+        answer_results = self.answer_dao.create_answers(answers_to_create) if answers_to_create else []
+        if answers_to_create:
+            GradingCheckpointDao().delete_checkpoints(exam_id, [answer["student_id"] for answer in answers_to_create])
+        return {
+            "answers": [self.create_answer_response(answer_result) for answer_result in answer_results],
+            "failed": failed
+        }
+
+    def process_answer_pdf(self, answer_pdf: str, answer_key: List[Dict], qs: Optional[QuestionSplitter] = None) -> List[Dict]:
         """
         Process the answer PDF to extract relevant information.
 
         Args:
             answer_pdf (str): The PDF containing the answers.
             answer_key (List[Dict]): The answer key.
+            qs (Optional[QuestionSplitter]): A splitter to reuse, a new one is created if omitted.
 
         Returns:
             List[Dict]: Processed information from the answer PDF.
@@ -55,7 +119,7 @@ class AnswerCore:
         if not answer_pdf:
             raise BadRequestError("Could not parse the PDF")
 
-        qs = QuestionSplitter()
+        qs = qs or QuestionSplitter()
         sorted_student_answer = sorted(qs.splitter(answer_pdf), key=lambda x: x['no'])
         return self.merge_student_and_answer_key(sorted_student_answer, answer_key)
 
@@ -69,21 +133,22 @@ class AnswerCore:
         Returns:
             Dict: The individual answer response.
         """
-        answer, student, exam = self.get_individual_answer_details(answer_id)
-        return self.create_individual_answer_response(answer, student, exam)
+        return self.create_individual_answer_response(self.get_individual_answer_details(answer_id))
 
-    def get_answers_by_exam_id(self, exam_id: int) -> List[Dict]:
+    def get_answers_by_exam_id(self, exam_id: int, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Dict]:
         """
         Retrieve answers for a specific exam.
 
         Args:
             exam_id (int): The ID of the exam.
+            after_id (Optional[int]): Return only answers with a larger ID.
+            limit (Optional[int]): Maximum number of answers, all of them if omitted.
 
         Returns:
-            List[Dict]: The list of answer responses.
+            List[Dict]: The list of answer responses, in ID order.
         """
-        answers = self.answer_dao.get_answers_by_exam_id(exam_id)
-        return [self.create_answer_response(*self.extract_answer_and_student(answer_result)) for answer_result in answers]
+        answers = self.answer_dao.get_answers_by_exam_id(exam_id, after_id=after_id, limit=limit)
+        return [self.create_answer_response(answer_result) for answer_result in answers]
 
     def delete_answer(self, answer_id: int) -> bool:
         """
@@ -108,9 +173,9 @@ class AnswerCore:
         Returns:
             Tuple[Dict, str]: Exam details and context key.
         """
-        exam_context_details = self.exam_dao.get_exam_by_id(exam_id)
+        exam_context_details = self.exam_dao.get_exam_for_grading(exam_id)
         exam_details = exam_context_details[0].__dict__ if exam_context_details[0] else {}
-        context_key = exam_context_details[1].__dict__["context_key"] if exam_context_details[1] else None
+        context_key = exam_context_details[1]
 
         if not exam_details:
             raise InternalServerError("Provided Exam Details not Present")
@@ -139,6 +204,7 @@ class AnswerCore:
                 and k < len(json_answer_key)
                 and sorted_student_answer[j]["no"] == json_answer_key[k]["no"]
             ):
+                temp["no"] = json_answer_key[k]["no"]
                 temp["question"] = json_answer_key[k]["question"]
                 temp["student_answer"] = sorted_student_answer[j]["answer"]
                 temp["answer_key"] = json_answer_key[k]["answer"]
@@ -147,6 +213,7 @@ class AnswerCore:
             elif k < len(json_answer_key) and (
                 j == len(sorted_student_answer) or sorted_student_answer[j]["no"] > json_answer_key[k]["no"]
             ):
+                temp["no"] = json_answer_key[k]["no"]
                 temp["question"] = json_answer_key[k]["question"]
                 temp["student_answer"] = ""
                 temp["answer_key"] = json_answer_key[k]["answer"]
@@ -158,42 +225,109 @@ class AnswerCore:
 
         return json_answer_list
 
-    def grade_answer(self, context_key: str, json_answer_list: List[Dict]) -> Tuple[List[Dict], float]:
+    def grade_answer(self, context_key: str, json_answer_list: List[Dict], progress_callback: Optional[Callable] = None, exam_id: Optional[int] = None, retrieved_context: Optional[Dict] = None, student_id: Optional[int] = None) -> Tuple[List[Dict], float]:
         """
         Grade answers using the provided context key.
 
         Args:
             context_key (str): The context key.
             json_answer_list (List[Dict]): List of student answers.
+            progress_callback (Optional[Callable]): Forwarded to GraderCohere.grade.
+            exam_id (Optional[int]): Exam the grade cache hits and misses are recorded against.
+            retrieved_context (Optional[Dict]): Passages precomputed at exam creation, see ExamModel.retrieved_context.
+            student_id (Optional[int]): Student whose script is graded, enables checkpointing together with exam_id.
 
         Returns:
             Tuple[List[Dict], float]: Evaluation details and total score.
         """
-        cohere_grader = GraderCohere(context_key)
-        return cohere_grader.grade(json_answer_list)
+        cohere_grader = GraderCohere(context_key, exam_id=exam_id, retrieved_context=retrieved_context)
+        if exam_id is not None and student_id is not None:
+            result = self.grade_with_checkpoints(cohere_grader, json_answer_list, exam_id, student_id, progress_callback)
+        else:
+            result = cohere_grader.grade(json_answer_list, progress_callback=progress_callback)
+        if exam_id is not None:
+            self.record_grading_stats(exam_id, cohere_grader)
+        return result
 
-    def create_answer_response(self, answer: Dict, student: Dict) -> Dict:
+    def record_grading_stats(self, exam_id: int, cohere_grader: GraderCohere) -> None:
+        """
+        Add the grade cache hits and misses and the batched prompts of a grading run to the exam totals.
+
+        Args:
+            exam_id (int): The ID of the exam.
+            cohere_grader (GraderCohere): The grader that graded the run.
+        """
+        self.grade_cache_dao.record_stats(exam_id, hits=cohere_grader.cache.hits, misses=cohere_grader.cache.misses)
+        batch_totals = cohere_grader.batch_totals()
+        if batch_totals["batches"]:
+            GradingBatchStatsDao().record_stats(exam_id, config.GRADER_BATCH_SIZE, batch_totals)
+
+    def grade_with_checkpoints(self, cohere_grader: GraderCohere, json_answer_list: List[Dict], exam_id: int, student_id: int, progress_callback: Optional[Callable] = None, max_workers: Optional[int] = None) -> Tuple[List[Dict], float]:
+        """
+        Grade a script, checkpointing every question as it finishes.
+
+        Questions checkpointed by an earlier attempt for the same (exam_id, student_id,
+        question no) are reused, unless the student answer, answer key or prompt
+        changed since. The checkpoints are deleted once the answer is stored.
+
+        Args:
+            cohere_grader (GraderCohere): The grader of the exam.
+            json_answer_list (List[Dict]): List of student answers.
+            exam_id (int): The ID of the exam.
+            student_id (int): The ID of the student.
+            progress_callback (Optional[Callable]): Forwarded to GraderCohere.grade.
+            max_workers (Optional[int]): Forwarded to GraderCohere.grade.
+
+        Returns:
+            Tuple[List[Dict], float]: Evaluation details and total score.
+        """
+        checkpoints = GradingCheckpointDao().get_checkpoints(exam_id, student_id)
+        input_hashes = [cohere_grader.cache.make_key(item) for item in json_answer_list]
+        completed = {}
+        for i, item in enumerate(json_answer_list):
+            checkpoint = checkpoints.get(item.get("no"))
+            if checkpoint is not None and checkpoint.input_hash == input_hashes[i]:
+                completed[i] = checkpoint.result
+        if completed:
+            print(f"Resuming exam {exam_id} student {student_id}: {len(completed)} of {len(json_answer_list)} questions already graded")
+
+        def record(index: int, total: int, graded: Dict) -> None:
+            question_no = json_answer_list[index].get("no")
+            # question_no is an Integer column, questions numbered like "1a" are not checkpointed
+            if index not in completed and isinstance(question_no, int):
+                try:
+                    # a session per question, questions are graded on several threads and the
+                    # checkpoint has to survive a failure of the caller's unit of work
+                    GradingCheckpointDao(own_session=True).put_checkpoint(exam_id, student_id, question_no, input_hashes[index], graded)
+                except Exception as error:
+                    # a lost checkpoint only costs a regrade on resume, it must not fail the script
+                    print(error)
+            if progress_callback is not None:
+                progress_callback(index, total, graded)
+
+        return cohere_grader.grade(json_answer_list, progress_callback=record, completed=completed, max_workers=max_workers)
+
+    def create_answer_response(self, answer: Row) -> Dict:
         """
         Create a response for an answer.
 
         Args:
-            answer (Dict): Answer details.
-            student (Dict): Student details.
+            answer (Row): Answer row with the student's name and roll number, see ANSWER_LIST_COLUMNS.
 
         Returns:
             Dict: Answer response.
         """
         result = {
-            "id": answer["id"],
-            "student_name": student["name"],
-            "student_roll_no": student["roll_no"],
-            "score": answer["score"],
-            "confidence": answer["confidence"],
-            "file_name": answer["file_name"]
+            "id": answer.id,
+            "student_name": answer.student_name,
+            "student_roll_no": answer.student_roll_no,
+            "score": answer.score,
+            "confidence": answer.confidence,
+            "file_name": answer.file_name
         }
         return result
 
-    def get_individual_answer_details(self, answer_id: int) -> Tuple[Dict, Dict, Dict]:
+    def get_individual_answer_details(self, answer_id: int) -> Row:
         """
         Retrieve details of an individual answer.
 
@@ -201,46 +335,28 @@ class AnswerCore:
             answer_id (int): The ID of the answer.
 
         Returns:
-            Tuple[Dict, Dict, Dict]: Answer, student, and exam details.
+            Row: Answer, student and exam details, fetched in a single query.
         """
-        answer_result = self.answer_dao.get_answer_by_id(answer_id)
-        answer, student = self.extract_answer_and_student(answer_result)
-        exam = self.exam_dao.get_exam_by_id(answer["exam_id"])[0].__dict__
-        return answer, student, exam
+        return self.answer_dao.get_answer_by_id(answer_id)
 
-    def create_individual_answer_response(self, answer: Dict, student: Dict, exam: Dict) -> Dict:
+    def create_individual_answer_response(self, answer: Row) -> Dict:
         """
         Create a response for an individual answer.
 
         Args:
-            answer (Dict): Answer details.
-            student (Dict): Student details.
-            exam (Dict): Exam details.
+            answer (Row): Answer row with student and exam details.
 
         Returns:
             Dict: Individual answer response.
         """
         result = {
-            "id": answer["id"],
-            "student_name": student["name"],
-            "student_roll_no": student["roll_no"],
-            "score": answer["score"],
-            "confidence": answer["confidence"],
-            "file_name": answer["file_name"],
-            "evaluation_details": answer["evaluation_details"],
-            "max_exam_score": exam["total_marks"]
+            "id": answer.id,
+            "student_name": answer.student_name,
+            "student_roll_no": answer.student_roll_no,
+            "score": answer.score,
+            "confidence": answer.confidence,
+            "file_name": answer.file_name,
+            "evaluation_details": answer.evaluation_details,
+            "max_exam_score": answer.max_exam_score
         }
         return result
-
-    def extract_answer_and_student(self, input: Tuple) -> Tuple[Dict, Dict]:
-        """
-        Extract answer and student details from input tuple.
-
-        Args:
-            input (Tuple): Tuple containing student and answer details.
-
-        Returns:
-            Tuple[Dict, Dict]: Extracted answer and student details.
-        """
-        student, answer = input[0].__dict__, input[1].__dict__
-        return answer, student
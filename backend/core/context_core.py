@@ -1,6 +1,13 @@
-from typing import List, Optional, Dict
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Dict
 from uuid import uuid4
+import fcntl
+import hashlib
+import os
 
+from langchain.docstore.document import Document
+
+from backend.config.config import config
 from backend.dao.context_dao import ContextDao
 from backend.schemas.context_schema import ContextResponse, CreateContext
 from backend.rag_models.vector_store import VectorDB
@@ -26,14 +33,26 @@ class ContextCore:
         if not context_pdf:
             raise BadRequestError("Could not parse the PDF")
 
-        context_key = self._generate_context_key()
-        vector_db = VectorDB()
-
-        if vector_db.embed_and_store(context_pdf, context_key):
-            context = self._store_context(input, filename, context_key)
-            return ContextResponse.model_validate(context).model_dump(mode="json")
-        else:
-            raise ModelError("Could not process the context PDF!")
+        # a PDF with the same content shares the vector collection that is already stored.
+        # The lock keeps a delete from dropping that collection between the lookup and
+        # the insert of the context reusing it
+        content_hash = self._fingerprint(context_pdf)
+        with self._content_lock(content_hash):
+            # a session of its own, the insert has to be committed before the lock is released
+            context_dao = ContextDao(own_session=True)
+            existing_context = context_dao.get_context_by_content_hash(content_hash)
+            if existing_context is not None:
+                context = self._store_context(context_dao, input, filename, existing_context.context_key, content_hash)
+                return ContextResponse.model_validate(context).model_dump(mode="json")
+
+            context_key = self._generate_context_key()
+            vector_db = VectorDB()
+
+            if vector_db.embed_and_store(context_pdf, context_key):
+                context = self._store_context(context_dao, input, filename, context_key, content_hash)
+                return ContextResponse.model_validate(context).model_dump(mode="json")
+            else:
+                raise ModelError("Could not process the context PDF!")
 
     def get_context_by_id(self, context_id: int) -> Dict:
         """
@@ -48,17 +67,19 @@ class ContextCore:
         context = self.context_dao.get_context_by_id(context_id)
         return ContextResponse.model_validate(context).model_dump(mode="json")
 
-    def get_contexts_by_user_id(self, user_id: int) -> List[Dict]:
+    def get_contexts_by_user_id(self, user_id: int, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[Dict]:
         """
-        Retrieve all contexts for a given user ID.
+        Retrieve the contexts for a given user ID.
 
         Args:
             user_id (int): The ID of the user.
+            after_id (Optional[int]): Return only contexts with a larger ID.
+            limit (Optional[int]): Maximum number of contexts, all of them if omitted.
 
         Returns:
-            List[Dict]: List of contexts in JSON format.
+            List[Dict]: List of contexts in JSON format, in ID order.
         """
-        contexts = self.context_dao.get_contexts_by_user_id(user_id)
+        contexts = self.context_dao.get_contexts_by_user_id(user_id, after_id=after_id, limit=limit)
         return [ContextResponse.model_validate(context).model_dump(mode="json") for context in contexts]
 
     def delete_context(self, context_id: int) -> bool:
@@ -71,9 +92,39 @@ class ContextCore:
         Returns:
             bool: True if deletion is successful, False otherwise.
         """
-        self.context_dao.delete_context(context_id)
+        # a session of its own, the delete has to be committed before the lock is released
+        context_dao = ContextDao(own_session=True)
+        content_hash = context_dao.get_context_by_id(context_id).content_hash
+        with self._content_lock(content_hash):
+            context_key, remaining_references = context_dao.delete_context(context_id)
+            # the vector collection is shared by every context with the same content, drop it with the last one
+            if remaining_references == 0:
+                VectorDB().delete_collection(context_key)
         return True
 
+    @contextmanager
+    def _content_lock(self, content_hash: Optional[str]) -> Iterator[None]:
+        """
+        Serialize creates and deletes of contexts with the same content across threads and processes.
+
+        The database writes commit inside the lock, on a session outside the request's unit
+        of work, so a create either sees the context being deleted gone or is counted as a
+        remaining reference.
+
+        Args:
+            content_hash (Optional[str]): Fingerprint of the PDF content, None for contexts stored before fingerprinting.
+        """
+        if content_hash is None:
+            # never looked up by content, so nothing can reuse its collection
+            yield
+            return
+        os.makedirs(config.CONTEXT_LOCK_DIR, exist_ok=True)
+        # 256 striped lock files instead of one per content
+        lock_path = os.path.join(config.CONTEXT_LOCK_DIR, f"{content_hash[:2]}.lock")
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
     def _generate_context_key(self) -> str:
         """
         Generate a unique context key.
@@ -84,22 +135,41 @@ class ContextCore:
         uuid_str = str(uuid4()).replace('-', '')
         return f"CONTEXT{uuid_str[0].upper()}{uuid_str[1:]}"
 
-    def _store_context(self, input: CreateContext, filename: str, context_key: str) -> Dict:
+    def _fingerprint(self, context_pdf: List[Document]) -> str:
+        """
+        Fingerprint the content of a reference PDF.
+
+        Args:
+            context_pdf (List[Document]): The pages of the PDF.
+
+        Returns:
+            str: SHA-256 of the whitespace-normalized page texts.
+        """
+        digest = hashlib.sha256()
+        for page in context_pdf:
+            digest.update(" ".join(page.page_content.split()).encode("utf-8"))
+            digest.update(b"\f")
+        return digest.hexdigest()
+
+    def _store_context(self, context_dao: ContextDao, input: CreateContext, filename: str, context_key: str, content_hash: Optional[str] = None) -> Dict:
         """
         Store the context in the database.
 
         Args:
+            context_dao (ContextDao): The DAO whose session commits the insert.
             input (CreateContext): The input data for creating the context.
             filename (str): The name of the file.
-            context_key (str): The unique key for the context.
+            context_key (str): The key of the vector collection holding the context.
+            content_hash (Optional[str]): Fingerprint of the PDF content.
 
         Returns:
             Dict: The stored context.
         """
-        return self.context_dao.create_context(
+        return context_dao.create_context(
             name=input["name"],
             comments=input["comments"],
             context_key=context_key,
             user_id=input["user_id"],
-            filename=filename
+            filename=filename,
+            content_hash=content_hash
         )
@@ -3,14 +3,21 @@ import datetime
 import json
 from backend.utils.errors import NotFoundError, AuthenticationError, InternalServerError, BadRequestError
 from backend.dao.exam_dao import ExamDao
+from backend.dao.context_dao import ContextDao
+from backend.dao.grade_cache_dao import GradeCacheDao
+from backend.dao.grading_batch_stats_dao import GradingBatchStatsDao
+from backend.dao.grading_job_dao import GradingJobDao
 from backend.schemas.exam_schema import ExamResponse
 from backend.config.config import config
 from backend.rag_models.question_splitter import QuestionSplitter
+from backend.rag_models.grader import GraderCohere
+from backend.core.grading_job_core import remove_job_files
 
 class ExamCore:
 
     def __init__(self):
         self.exam_dao = ExamDao()
+        self.grade_cache_dao = GradeCacheDao()
 
     def create_exam(self, input: ExamResponse, filename: str, answer_key: str = ""):
         """
@@ -29,6 +36,9 @@ class ExamCore:
 
         qs = QuestionSplitter()
         json_answer_key = qs.splitter(answer_key)
+        retrieved_context = None
+        if config.PRECOMPUTE_EXAM_CONTEXT and input["context_id"] is not None:
+            retrieved_context = self.__retrieve_context(input["context_id"], json_answer_key)
         exam = self.exam_dao.create_exam(
             name=input["name"],
             conducted_date=input["conducted_date"],
@@ -37,7 +47,8 @@ class ExamCore:
             user_id=input["user_id"],
             answer_key=json_answer_key,
             context_id=input["context_id"],
-            filename=filename
+            filename=filename,
+            retrieved_context=retrieved_context
         )
         return ExamResponse.model_validate(exam).model_dump(mode="json")
 
@@ -54,10 +65,9 @@ class ExamCore:
         exam = self.exam_dao.get_exam_by_id(exam_id)
         if not exam:
             raise NotFoundError("Exam does not exist!")
-        exam_obj = exam[0]
-        return ExamResponse.model_validate(exam_obj).model_dump(mode="json")
+        return ExamResponse.model_validate(exam).model_dump(mode="json")
 
-    def get_exams_by_user_id(self, user_id: int):
+    def get_exams_by_user_id(self, user_id: int, after_id: int = None, limit: int = None):
         """
         Retrieve exams by user ID.
 
@@ -92,22 +102,23 @@ class ExamCore:
         exam = self.exam_dao.get_exam_by_id(id)
         if exam is None:
             raise NotFoundError("Exam doesnot exist!")
-        exam_obj = exam[0]
-        exam_res = ExamResponse.model_validate(exam_obj).model_dump(mode="json")
+        exam_res = ExamResponse.model_validate(exam).model_dump(mode="json")
         return exam_res
 
     # Retrieve a user by email
         - user_id (int): User ID.
+        - after_id (int, optional): Return only exams with a larger ID. Defaults to None.
+        - limit (int, optional): Maximum number of exams. Defaults to None, all of them.
 
         Returns:
-        - list: List of exam details.
+        - list: List of exam details, in ID order.
         """
-        exams = self.exam_dao.get_exams_by_user_id(user_id)
-        return [ExamResponse.model_validate(exam[0]).model_dump(mode="json") for exam in exams]
+        exams = self.exam_dao.get_exams_by_user_id(user_id, after_id=after_id, limit=limit)
+        return [ExamResponse.model_validate(exam).model_dump(mode="json") for exam in exams]
 
     def delete_exam(self, exam_id: int):
         """
-        Delete an exam.
+        Delete an exam together with its grading jobs and their spooled scripts.
 
         Parameters:
         - exam_id (int): Exam ID.
@@ -115,9 +126,78 @@ class ExamCore:
         Returns:
         - bool: True if deletion is successful.
         """
+        job_file_paths = GradingJobDao().get_job_file_paths(exam_id=exam_id)
         self.exam_dao.delete_exam(exam_id)
+        remove_job_files(job_file_paths)
         return True
 
+    def get_grade_cache_stats(self, exam_id: int):
+        """
+        Retrieve how many grades of an exam were served from the grade cache.
+
+        Parameters:
+        - exam_id (int): Exam ID.
+
+        Returns:
+        - dict: Cache hits, misses and hit rate.
+        """
+        stats = self.grade_cache_dao.get_stats_by_exam_id(exam_id)
+        hits, misses = (stats.hits, stats.misses) if stats else (0, 0)
+        total = hits + misses
+        return {"exam_id": exam_id, "hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+    def get_grading_batch_stats(self, exam_id: int):
+        """
+        Retrieve the cost of the batched grading prompts of an exam per GRADER_BATCH_SIZE, so batch sizes can be compared.
+
+        Parameters:
+        - exam_id (int): Exam ID.
+
+        Returns:
+        - list: Totals per batch size, with tokens per question, latency per batch and the share of questions regraded one by one.
+        """
+        result = []
+        for stats in GradingBatchStatsDao().get_stats_by_exam_id(exam_id):
+            result.append({
+                "exam_id": exam_id,
+                "batch_size": stats.batch_size,
+                "batches": stats.batches,
+                "items": stats.items,
+                "prompt_tokens": stats.prompt_tokens,
+                "response_tokens": stats.response_tokens,
+                "latency": stats.latency,
+                "regraded": stats.regraded,
+                "prompt_tokens_per_item": stats.prompt_tokens / stats.items if stats.items else 0.0,
+                "response_tokens_per_item": stats.response_tokens / stats.items if stats.items else 0.0,
+                "latency_per_batch": stats.latency / stats.batches if stats.batches else 0.0,
+                "regrade_rate": stats.regraded / stats.items if stats.items else 0.0,
+            })
+        return result
+
+    def __retrieve_context(self, context_id: int, json_answer_key):
+        """
+        Retrieve the context passages of every answer-key question, so grading never searches the vector store.
+
+        Parameters:
+        - context_id (int): Context ID.
+        - json_answer_key (list): Answer key split into questions.
+
+        Returns:
+        - dict: context_key, k and the passages of each question number, or None if retrieval failed.
+        """
+        try:
+            context_key = ContextDao().get_context_by_id(context_id).context_key
+            grader = GraderCohere(context_key)
+            passages = {
+                str(item["no"]): grader.search_passages({"question": item["question"], "answer_key": item["answer"]})
+                for item in json_answer_key
+            }
+        except Exception as error:
+            # the exam is still usable, grading retrieves the passages itself
+            print(error)
+            return None
+        return {"context_key": context_key, "k": grader.no_of_k, "passages": passages}
+
     def __is_valid_json(self, input_string):
         try:
             json.loads(input_string)
@@ -0,0 +1,139 @@
+import os
+import shutil
+from typing import BinaryIO, Dict, List
+from uuid import uuid4
+
+from backend.config.config import config
+from backend.core.answer_core import AnswerCore
+from backend.dao.grading_job_dao import GradingJobDao
+from backend.schemas.answer_schema import CreateAnswer
+from backend.schemas.grading_job_schema import GradingJobResponse
+from backend.utils.db_conn import conn
+from backend.utils.pdf_extractor import extract_text
+
+
+def remove_job_files(file_paths: List[str]) -> None:
+    """
+    Remove spooled answer scripts that no job will read again.
+
+    Args:
+        file_paths (List[str]): The paths of the scripts.
+    """
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+class GradingJobCore:
+    def __init__(self):
+        self.grading_job_dao = GradingJobDao()
+
+    def submit_job(self, create_answer: CreateAnswer, pdf_file: BinaryIO, filename: str) -> Dict:
+        """
+        Store the uploaded answer script and queue it for grading.
+
+        Args:
+            create_answer (CreateAnswer): The student and exam the script belongs to.
+            pdf_file (BinaryIO): The uploaded PDF, copied to the job directory in chunks.
+            filename (str): The name of the file.
+
+        Returns:
+            Dict: The queued job.
+        """
+        os.makedirs(config.GRADING_JOB_DIR, exist_ok=True)
+        file_path = os.path.join(config.GRADING_JOB_DIR, f"{uuid4().hex}.pdf")
+        with open(file_path, "wb") as job_file:
+            shutil.copyfileobj(pdf_file, job_file, config.UPLOAD_CHUNK_SIZE)
+
+        job = self.grading_job_dao.create_job(
+            student_id=create_answer.student_id,
+            exam_id=create_answer.exam_id,
+            filename=filename,
+            file_path=file_path
+        )
+        return GradingJobResponse.model_validate(job).model_dump(mode="json")
+
+    def get_job_by_id(self, job_id: int) -> Dict:
+        """
+        Retrieve a grading job and its progress.
+
+        Args:
+            job_id (int): The ID of the job.
+
+        Returns:
+            Dict: The job status and per-question progress.
+        """
+        job = self.grading_job_dao.get_job_by_id(job_id)
+        return GradingJobResponse.model_validate(job).model_dump(mode="json")
+
+    def get_jobs_by_exam_id(self, exam_id: int) -> List[Dict]:
+        """
+        Retrieve all grading jobs of an exam.
+
+        Args:
+            exam_id (int): The ID of the exam.
+
+        Returns:
+            List[Dict]: The jobs with their status and per-question progress.
+        """
+        jobs = self.grading_job_dao.get_jobs_by_exam_id(exam_id)
+        return [GradingJobResponse.model_validate(job).model_dump(mode="json") for job in jobs]
+
+    def run_next_job(self) -> bool:
+        """
+        Claim the oldest queued job and grade it.
+
+        A failed job goes back on the queue until it has run GRADING_JOB_MAX_ATTEMPTS
+        times. Its script is kept until the job succeeds or is given up.
+
+        The answer and the job's completion are one unit of work. Claims, progress
+        and failures commit on sessions of their own, so they are kept when it rolls back.
+
+        Returns:
+            bool: True if a job was processed, False if the queue was empty.
+        """
+        job = GradingJobDao(own_session=True).claim_next_job()
+        if job is None:
+            return False
+
+        try:
+            answer_pdf = extract_text(job.file_path, name=job.file_name)
+            with conn.session_scope():
+                answer = AnswerCore().create_answer(
+                    CreateAnswer(student_id=job.student_id, exam_id=job.exam_id),
+                    answer_pdf,
+                    filename=job.file_name,
+                    progress_callback=self._progress_recorder(job.id)
+                )
+                GradingJobDao().complete_job(job.id, answer_id=answer["id"])
+        except Exception as error:
+            print(error)
+            error_message = str(error) or type(error).__name__
+            if job.attempts < config.GRADING_JOB_MAX_ATTEMPTS:
+                GradingJobDao(own_session=True).retry_job(job.id, error_message=error_message)
+                return True
+            GradingJobDao(own_session=True).fail_job(job.id, error_message=error_message)
+        remove_job_files([job.file_path])
+        return True
+
+    def _progress_recorder(self, job_id: int):
+        """
+        Build a GraderCohere progress callback that persists per-question status.
+
+        Args:
+            job_id (int): The ID of the job being graded.
+
+        Returns:
+            Callable: The progress callback.
+        """
+        progress: List[Dict] = []
+
+        def record(index: int, total: int, graded: Dict) -> None:
+            if not progress:
+                progress.extend({"no": no + 1, "status": "queued"} for no in range(total))
+            progress[index] = {"no": index + 1, "status": "done", "marks": graded.get("Marks")}
+            completed = sum(1 for item in progress if item["status"] == "done")
+            # a session per call, questions are graded on several threads
+            GradingJobDao(own_session=True).update_progress(job_id, total_questions=total, completed_questions=completed, progress=list(progress))
+
+        return record
@@ -3,6 +3,8 @@ import datetime
 
 from backend.utils.errors import NotFoundError, AuthenticationError
 from backend.dao.student_dao import StudentDao
+from backend.dao.grading_job_dao import GradingJobDao
+from backend.core.grading_job_core import remove_job_files
 from backend.schemas.student_schema import StudentResponse, CreateStudent
 from backend.config.config import config
 
@@ -42,22 +44,24 @@ class StudentCore:
         student = self.student_dao.get_student_by_id(student_id)
         return StudentResponse.model_validate(student).model_dump(mode="json")
 
-    def get_students_by_user_id(self, user_id: int):
+    def get_students_by_user_id(self, user_id: int, after_id: int = None, limit: int = None):
         """
         Retrieve students by user ID.
 
         Parameters:
         - user_id (int): User ID.
+        - after_id (int, optional): Return only students with a larger ID. Defaults to None.
+        - limit (int, optional): Maximum number of students. Defaults to None, all of them.
 
         Returns:
-        - list: List of student details.
+        - list: List of student details, in ID order.
         """
-        students = self.student_dao.get_students_by_user_id(user_id)
+        students = self.student_dao.get_students_by_user_id(user_id, after_id=after_id, limit=limit)
         return [StudentResponse.model_validate(student).model_dump(mode="json") for student in students]
 
     def delete_student(self, student_id: int):
         """
-        Delete a student.
+        Delete a student together with their grading jobs and spooled scripts.
 
         Parameters:
         - student_id (int): Student ID.
@@ -65,5 +69,7 @@ class StudentCore:
         Returns:
         - bool: True if deletion is successful.
         """
+        job_file_paths = GradingJobDao().get_job_file_paths(student_id=student_id)
         self.student_dao.delete_student(student_id)
+        remove_job_files(job_file_paths)
         return True
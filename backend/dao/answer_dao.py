@@ -1,9 +1,20 @@
-from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm import Session
 from sqlalchemy import exc
 
 from backend.utils.db_conn import conn  
 from backend.utils.errors import DatabaseError, DuplicateError, NotFoundError
-from backend.models.models import AnswerModel, StudentModel
+from backend.models.models import AnswerModel, StudentModel, ExamModel
+from backend.utils.pagination import keyset_page
+
+# Columns of an answer list row, see AnswerCore.create_answer_response
+ANSWER_LIST_COLUMNS = (
+    AnswerModel.id,
+    AnswerModel.score,
+    AnswerModel.confidence,
+    AnswerModel.file_name,
+    StudentModel.name.label("student_name"),
+    StudentModel.roll_no.label("student_roll_no"),
+)
 
 class AnswerDao:
     def __init__(self):
@@ -13,44 +24,72 @@ class AnswerDao:
         try:
             answer = AnswerModel(score=score, student_id=student_id, exam_id=exam_id, confidence=confidence, evaluation_details=evaluation_details, file_name=filename)
             self.db.add(answer)
-            self.db.commit()
+            conn.commit(self.db)
             self.db.refresh(answer)
             result = self.get_answer_by_id(answer.id)
         except exc.IntegrityError as error:
             print(error)
+            conn.rollback(self.db)
             raise DuplicateError("Similar Record already exists!")
         except Exception as error:
             print(error)
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Create_Answer")
         finally:
-            self.db.close()
+            conn.close(self.db)
         return result
 
+    def create_answers(self, answers: list):
+        try:
+            answer_models = [
+                AnswerModel(score=answer["score"], student_id=answer["student_id"], exam_id=answer["exam_id"], confidence=answer["confidence"], evaluation_details=answer["evaluation_details"], file_name=answer["filename"])
+                for answer in answers
+            ]
+            self.db.add_all(answer_models)
+            # read the generated ids before commit expires the instances
+            self.db.flush()
+            answer_ids = [answer.id for answer in answer_models]
+            conn.commit(self.db)
+            results = self.db.query(*ANSWER_LIST_COLUMNS).join(StudentModel, StudentModel.id == AnswerModel.student_id).filter(AnswerModel.id.in_(answer_ids)).order_by(AnswerModel.id).all()
+        except exc.IntegrityError as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DuplicateError("Similar Record already exists!")
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Create_Answers")
+        finally:
+            conn.close(self.db)
+        return results
+
+    # Retrieve an answer with its student and the exam's total marks in one query
     def get_answer_by_id(self, id: int):
         try:
-            # answer = self.db.query(AnswerModel).filter(AnswerModel.id == id).first()
-            filtered_answer_subquery = self.db.query(AnswerModel).filter(AnswerModel.id == id).subquery()
-            filtered_answer = aliased(AnswerModel, filtered_answer_subquery)
-            result = self.db.query(StudentModel, filtered_answer).join(filtered_answer, StudentModel.id == filtered_answer.student_id).first()
+            result = self.db.query(
+                *ANSWER_LIST_COLUMNS,
+                AnswerModel.exam_id,
+                AnswerModel.evaluation_details,
+                ExamModel.total_marks.label("max_exam_score"),
+            ).join(StudentModel, StudentModel.id == AnswerModel.student_id).join(ExamModel, ExamModel.id == AnswerModel.exam_id).filter(AnswerModel.id == id).first()
             if result is None:
                 raise NotFoundError("Answer doesnot exist!")
         except Exception as error:
             print(error)
             raise DatabaseError("DB operation Failed: Get_Answer_By_Id")
         finally:
-            self.db.close()
+            conn.close(self.db)
         return result
 
-    def get_answers_by_exam_id(self, exam_id: str):
+    def get_answers_by_exam_id(self, exam_id: str, after_id: int = None, limit: int = None):
         try:
-            filtered_answers_subquery = self.db.query(AnswerModel).filter(AnswerModel.exam_id == exam_id).subquery()
-            filtered_answers = aliased(AnswerModel, filtered_answers_subquery)
-            results = self.db.query(StudentModel, filtered_answers).join(filtered_answers, StudentModel.id == filtered_answers.student_id).all()
+            query = self.db.query(*ANSWER_LIST_COLUMNS).join(StudentModel, StudentModel.id == AnswerModel.student_id).filter(AnswerModel.exam_id == exam_id)
+            results = keyset_page(query, AnswerModel.id, after_id, limit).all()
         except Exception as error:
             print(error)
             raise DatabaseError("DB operation Failed: Get_Answers_By_User_Id")
         finally:
-            self.db.close()
+            conn.close(self.db)
         return results
 
 
@@ -60,10 +99,11 @@ class AnswerDao:
             if answer is None:
                 raise NotFoundError("Answer doesnot exist!")
             self.db.delete(answer)
-            self.db.commit()
+            conn.commit(self.db)
         except Exception as error:
             print(error)
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Delete_Answer")
         finally:
-            self.db.close()
+            conn.close(self.db)
         return True
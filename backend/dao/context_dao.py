@@ -3,27 +3,32 @@ from sqlalchemy import exc
 
 from backend.utils.db_conn import conn  
 from backend.utils.errors import DatabaseError, DuplicateError, NotFoundError
-from backend.models.models import ContextModel, ExamModel
+from backend.models.models import ContextModel, ExamModel, RetrievalCacheModel
+from backend.utils.pagination import keyset_page
 
 class ContextDao:
-    def __init__(self):
-        self.db = conn.get_db()
+    # own_session commits right away instead of at the end of the caller's unit
+    # of work, for writes that must be visible before a lock is released
+    def __init__(self, own_session: bool = False):
+        self.db = conn.new_session() if own_session else conn.get_db()
 
     # Create a new user
-    def create_context(self, name: str, comments: str, user_id: int, context_key: str, filename: str,):
+    def create_context(self, name: str, comments: str, user_id: int, context_key: str, filename: str, content_hash: str = None):
         try:
-            context = ContextModel(name=name, comments=comments, user_id=user_id, context_key=context_key, file_name=filename)
+            context = ContextModel(name=name, comments=comments, user_id=user_id, context_key=context_key, file_name=filename, content_hash=content_hash)
             self.db.add(context)
-            self.db.commit()
+            conn.commit(self.db)
             self.db.refresh(context)
         except exc.IntegrityError as error:
             print(error)
+            conn.rollback(self.db)
             raise DuplicateError("Similar Record already exists!")
         except Exception as error:
             print(error)
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Create_Context")
         finally:
-            self.db.close()
+            conn.close(self.db)
         return context
 
     # Retrieve a context by ID
@@ -37,31 +42,47 @@ class ContextDao:
             raise DatabaseError("DB operation Failed: Get_Context_By_Id")
         return context
 
+    # Retrieve a context whose reference PDF has the same content
+    def get_context_by_content_hash(self, content_hash: str):
+        try:
+            context = self.db.query(ContextModel).filter(ContextModel.content_hash == content_hash).first()
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Context_By_Content_Hash")
+        return context
+
     # Retrieve a context by email
-    def get_contexts_by_user_id(self, user_id: str):
+    def get_contexts_by_user_id(self, user_id: str, after_id: int = None, limit: int = None):
         try:
-            contexts = self.db.query(ContextModel).filter(ContextModel.user_id == user_id).all()
+            query = self.db.query(ContextModel).filter(ContextModel.user_id == user_id)
+            contexts = keyset_page(query, ContextModel.id, after_id, limit).all()
         except Exception as error:
             raise DatabaseError("DB operation Failed: Get_Context_By_User_Id")
         return contexts
 
 
+    # Returns the context key of the deleted context and how many contexts still share its vector collection
     def delete_context(self, id: int):
+        # a plain commit instead of db.begin(), the request session may already be in a transaction
         try:
-            with self.db.begin() as transaction:
-                context = self.db.query(ContextModel).filter(ContextModel.id == id).first()
-                if context is None:
-                    transaction.rollback()
-                    raise NotFoundError("Context doesnot exist!")
-                self.db.query(ExamModel).filter(ExamModel.context_id == context.id).update({ExamModel.context_id: None})
-                self.db.delete(context)
-                transaction.commit()
+            context = self.db.query(ContextModel).filter(ContextModel.id == id).first()
+            if context is None:
+                conn.rollback(self.db)
+                raise NotFoundError("Context doesnot exist!")
+            context_key = context.context_key
+            # passages retrieved for the exams of this context are stale once it is gone
+            linked_exam_ids = [exam.id for exam in self.db.query(ExamModel.id).filter(ExamModel.context_id == context.id)]
+            self.db.query(RetrievalCacheModel).filter(RetrievalCacheModel.exam_id.in_(linked_exam_ids)).delete(synchronize_session=False)
+            self.db.query(ExamModel).filter(ExamModel.context_id == context.id).update({ExamModel.context_id: None})
+            self.db.delete(context)
+            remaining_references = self.db.query(ContextModel).filter(ContextModel.context_key == context_key, ContextModel.id != id).count()
+            conn.commit(self.db)
         except NotFoundError as error:
             raise error
         except Exception as error:
             print(error)
-            transaction.rollback()
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Delete_Context")
         finally:
-            self.db.close()
-        return True
+            conn.close(self.db)
+        return context_key, remaining_references
@@ -1,18 +1,31 @@
 
-from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm import Session
 from sqlalchemy import exc, and_
 
 from backend.utils.db_conn import conn  
 from backend.utils.errors import DatabaseError, DuplicateError, NotFoundError
-from backend.models.models import ExamModel, AnswerModel, ContextModel
+from backend.models.models import ExamModel, AnswerModel, ContextModel, GradeCacheStatsModel, GradingBatchStatsModel, RetrievalCacheModel, GradingCheckpointModel, GradingJobModel
+from backend.utils.pagination import keyset_page
 from datetime import datetime
 
+# Columns of an ExamResponse, the answer key and retrieved passages can be large
+EXAM_RESPONSE_COLUMNS = (
+    ExamModel.id,
+    ExamModel.name,
+    ExamModel.description,
+    ExamModel.total_marks,
+    ExamModel.conducted_date,
+    ExamModel.user_id,
+    ExamModel.context_id,
+    ExamModel.file_name,
+)
+
 class ExamDao:
     def __init__(self):
         self.db = conn.get_db()
 
     # Create a new user
-    def create_exam(self, name: str, conducted_date: datetime, description: str, total_marks: float, user_id: int, context_id: int, filename: str, answer_key):
+    def create_exam(self, name: str, conducted_date: datetime, description: str, total_marks: float, user_id: int, context_id: int, filename: str, answer_key, retrieved_context=None):
         try:
             print(name, conducted_date, description, total_marks, user_id, context_id, answer_key, filename)
             print(type(name), type(conducted_date), type(description), type(total_marks), type(user_id), type(context_id), type(answer_key), type(filename))
@@ -20,28 +33,28 @@ class ExamDao:
             cond_date = datetime_object.date()
             
             if answer_key is not None:
-                exam = ExamModel(name=name, conducted_date=cond_date, description=description, total_marks=total_marks, user_id=user_id, context_id=context_id, answer_key=answer_key, file_name=filename)
+                exam = ExamModel(name=name, conducted_date=cond_date, description=description, total_marks=total_marks, user_id=user_id, context_id=context_id, answer_key=answer_key, file_name=filename, retrieved_context=retrieved_context)
             else:
                 exam = ExamModel(name=name, conducted_date=cond_date, description=description, total_marks=total_marks, user_id=user_id, context_id=context_id, file_name=filename)                
             self.db.add(exam)
-            self.db.commit()
+            conn.commit(self.db)
             self.db.refresh(exam)
         except exc.IntegrityError as error:
             print(error)
+            conn.rollback(self.db)
             raise DuplicateError("Similar Record already exists!")
         except Exception as error:
             print(error)
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Create_Exam")
         finally:
-            self.db.close()
+            conn.close(self.db)
         return exam
 
-    # Retrieve a user by ID
+    # Retrieve the ExamResponse columns of an exam
     def get_exam_by_id(self, id: int):
         try:
-            filtered_exam_subquery = self.db.query(ExamModel).filter(ExamModel.id == id).subquery()
-            filtered_exams = aliased(ExamModel, filtered_exam_subquery)
-            result = self.db.query(filtered_exams, ContextModel).outerjoin(ContextModel, filtered_exams.context_id == ContextModel.id).first()
+            result = self.db.query(*EXAM_RESPONSE_COLUMNS).filter(ExamModel.id == id).first()
             if result is None:
                 raise NotFoundError("Exam doesnot exist!")
         except Exception as error:
@@ -49,11 +62,21 @@ class ExamDao:
             raise DatabaseError("DB operation Failed: Get_Exam_By_Id")
         return result
 
-    def get_exams_by_user_id(self, user_id: int):
+    # Retrieve a whole exam, answer key and retrieved passages included, with the key of its context
+    def get_exam_for_grading(self, id: int):
         try:
-            filtered_exam_subquery = self.db.query(ExamModel).filter(ExamModel.user_id == user_id).subquery()
-            filtered_exams = aliased(ExamModel, filtered_exam_subquery)
-            results = self.db.query(filtered_exams, ContextModel).outerjoin(ContextModel, filtered_exams.context_id == ContextModel.id).all()
+            result = self.db.query(ExamModel, ContextModel.context_key).outerjoin(ContextModel, ExamModel.context_id == ContextModel.id).filter(ExamModel.id == id).first()
+            if result is None:
+                raise NotFoundError("Exam doesnot exist!")
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Exam_For_Grading")
+        return result
+
+    def get_exams_by_user_id(self, user_id: int, after_id: int = None, limit: int = None):
+        try:
+            query = self.db.query(*EXAM_RESPONSE_COLUMNS).filter(ExamModel.user_id == user_id)
+            results = keyset_page(query, ExamModel.id, after_id, limit).all()
         except Exception as error:
             print(error)
             raise DatabaseError("DB operation Failed: Get_Exam_By_Id")
@@ -61,18 +84,24 @@ class ExamDao:
 
     # Delete a exam
     def delete_exam(self, id: int):
+        # a plain commit instead of db.begin(), the request session may already be in a transaction
         try:
-            with self.db.begin() as transaction:
-                exam = self.db.query(ExamModel).filter(ExamModel.id == id).first()
-                if exam is None:
-                    raise NotFoundError("Exam doesnot exist!")
-                self.db.query(AnswerModel).filter(AnswerModel.exam_id == exam.id).delete()
-                self.db.delete(exam)
-                transaction.commit()
+            exam = self.db.query(ExamModel).filter(ExamModel.id == id).first()
+            if exam is None:
+                raise NotFoundError("Exam doesnot exist!")
+            # jobs reference the answers, so they go first
+            self.db.query(GradingJobModel).filter(GradingJobModel.exam_id == exam.id).delete()
+            self.db.query(AnswerModel).filter(AnswerModel.exam_id == exam.id).delete()
+            self.db.query(GradeCacheStatsModel).filter(GradeCacheStatsModel.exam_id == exam.id).delete()
+            self.db.query(GradingBatchStatsModel).filter(GradingBatchStatsModel.exam_id == exam.id).delete()
+            self.db.query(RetrievalCacheModel).filter(RetrievalCacheModel.exam_id == exam.id).delete()
+            self.db.query(GradingCheckpointModel).filter(GradingCheckpointModel.exam_id == exam.id).delete()
+            self.db.delete(exam)
+            conn.commit(self.db)
         except Exception as error:
             print(error)
-            transaction.rollback()
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Delete_Exam")
         finally:
-            self.db.close()
+            conn.close(self.db)
         return True
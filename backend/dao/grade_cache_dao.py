@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import exc
+from sqlalchemy.dialects import postgresql, sqlite
+
+from backend.utils.db_conn import conn
+from backend.utils.errors import DatabaseError
+from backend.models.models import GradeCacheModel, GradeCacheStatsModel
+
+# Inserts that can add to an existing row instead of failing on it
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+class GradeCacheDao:
+    # own_session keeps cache entries out of the caller's unit of work, they are
+    # worth keeping even when the request that graded them fails
+    def __init__(self, own_session: bool = False):
+        self.db = conn.new_session() if own_session else conn.get_db()
+
+    # Retrieve a cached grading result, refreshing its position in the LRU order
+    def get_entry(self, cache_key: str, ttl_seconds: int):
+        try:
+            entry = self.db.query(GradeCacheModel).filter(GradeCacheModel.cache_key == cache_key).first()
+            if entry is None:
+                return None
+            if ttl_seconds and entry.created_at < datetime.utcnow() - timedelta(seconds=ttl_seconds):
+                self.db.delete(entry)
+                conn.commit(self.db)
+                return None
+            entry.last_used_at = datetime.utcnow()
+            conn.commit(self.db)
+            result = entry.result
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Get_Grade_Cache_Entry")
+        finally:
+            conn.close(self.db)
+        return result
+
+    # Store a grading result
+    def put_entry(self, cache_key: str, result: dict):
+        try:
+            self.db.merge(GradeCacheModel(cache_key=cache_key, result=result, created_at=datetime.utcnow(), last_used_at=datetime.utcnow()))
+            conn.commit(self.db)
+        except exc.IntegrityError as error:
+            # a concurrent grader stored the same key first, its result is just as good
+            print(error)
+            conn.rollback(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Put_Grade_Cache_Entry")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Evict the least recently used entries above max_entries
+    def evict_entries(self, max_entries: int):
+        try:
+            overflow = self.db.query(GradeCacheModel).count() - max_entries
+            if overflow <= 0:
+                return 0
+            # a plain list, IN does not take a LIMITed subquery on every backend
+            stale_keys = [row.cache_key for row in self.db.query(GradeCacheModel.cache_key).order_by(GradeCacheModel.last_used_at).limit(overflow)]
+            self.db.query(GradeCacheModel).filter(GradeCacheModel.cache_key.in_(stale_keys)).delete(synchronize_session=False)
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Evict_Grade_Cache_Entries")
+        finally:
+            conn.close(self.db)
+        return len(stale_keys)
+
+    # Add the hits and misses of one grading run to the exam totals
+    def record_stats(self, exam_id: int, hits: int, misses: int):
+        try:
+            upsert = UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+            if upsert is not None:
+                # one statement, so a row created by another worker never fails the caller's unit of work
+                statement = upsert(GradeCacheStatsModel).values(exam_id=exam_id, hits=hits, misses=misses)
+                self.db.execute(statement.on_conflict_do_update(
+                    index_elements=[GradeCacheStatsModel.exam_id],
+                    set_={"hits": GradeCacheStatsModel.hits + hits, "misses": GradeCacheStatsModel.misses + misses},
+                ))
+            else:
+                increment = {
+                    GradeCacheStatsModel.hits: GradeCacheStatsModel.hits + hits,
+                    GradeCacheStatsModel.misses: GradeCacheStatsModel.misses + misses,
+                }
+                updated = self.db.query(GradeCacheStatsModel).filter(GradeCacheStatsModel.exam_id == exam_id).update(increment, synchronize_session=False)
+                if not updated:
+                    self.db.add(GradeCacheStatsModel(exam_id=exam_id, hits=hits, misses=misses))
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Record_Grade_Cache_Stats")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Retrieve the cache hits and misses of an exam
+    def get_stats_by_exam_id(self, exam_id: int):
+        try:
+            stats = self.db.query(GradeCacheStatsModel).filter(GradeCacheStatsModel.exam_id == exam_id).first()
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Grade_Cache_Stats")
+        finally:
+            conn.close(self.db)
+        return stats
@@ -0,0 +1,48 @@
+from backend.utils.db_conn import conn
+from backend.utils.errors import DatabaseError
+from backend.models.models import GradingBatchStatsModel
+from backend.dao.grade_cache_dao import UPSERT_INSERTS
+
+# Counters added up by record_stats
+BATCH_COUNTERS = ("batches", "items", "prompt_tokens", "response_tokens", "latency", "regraded")
+
+class GradingBatchStatsDao:
+    def __init__(self):
+        self.db = conn.get_db()
+
+    # Add the batched prompts of one grading run to the exam totals for its batch size
+    def record_stats(self, exam_id: int, batch_size: int, totals: dict):
+        model = GradingBatchStatsModel
+        try:
+            upsert = UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+            if upsert is not None:
+                # one statement, so a row created by another worker never fails the caller's unit of work
+                statement = upsert(model).values(exam_id=exam_id, batch_size=batch_size, **totals)
+                self.db.execute(statement.on_conflict_do_update(
+                    index_elements=[model.exam_id, model.batch_size],
+                    set_={name: getattr(model, name) + totals[name] for name in BATCH_COUNTERS},
+                ))
+            else:
+                increment = {getattr(model, name): getattr(model, name) + totals[name] for name in BATCH_COUNTERS}
+                updated = self.db.query(model).filter(model.exam_id == exam_id, model.batch_size == batch_size).update(increment, synchronize_session=False)
+                if not updated:
+                    self.db.add(model(exam_id=exam_id, batch_size=batch_size, **totals))
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Record_Grading_Batch_Stats")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Retrieve the batch totals of an exam, one row per batch size
+    def get_stats_by_exam_id(self, exam_id: int):
+        try:
+            stats = self.db.query(GradingBatchStatsModel).filter(GradingBatchStatsModel.exam_id == exam_id).order_by(GradingBatchStatsModel.batch_size).all()
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Grading_Batch_Stats")
+        finally:
+            conn.close(self.db)
+        return stats
@@ -0,0 +1,58 @@
+from sqlalchemy import exc
+
+from backend.utils.db_conn import conn
+from backend.utils.errors import DatabaseError
+from backend.models.models import GradingCheckpointModel
+
+class GradingCheckpointDao:
+    # own_session keeps checkpoints out of the caller's unit of work, so the
+    # questions graded before a failure are not rolled back with it
+    def __init__(self, own_session: bool = False):
+        self.db = conn.new_session() if own_session else conn.get_db()
+
+    # Retrieve the questions of a script graded so far, keyed by question no
+    def get_checkpoints(self, exam_id: int, student_id: int):
+        try:
+            checkpoints = self.db.query(GradingCheckpointModel).filter(
+                GradingCheckpointModel.exam_id == exam_id,
+                GradingCheckpointModel.student_id == student_id,
+            ).all()
+            result = {checkpoint.question_no: checkpoint for checkpoint in checkpoints}
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Grading_Checkpoints")
+        finally:
+            conn.close(self.db)
+        return result
+
+    # Store the result of one graded question, replacing an older one for the same question
+    def put_checkpoint(self, exam_id: int, student_id: int, question_no: int, input_hash: str, result: dict):
+        try:
+            self.db.merge(GradingCheckpointModel(exam_id=exam_id, student_id=student_id, question_no=question_no, input_hash=input_hash, result=result))
+            conn.commit(self.db)
+        except exc.IntegrityError as error:
+            print(error)
+            conn.rollback(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Put_Grading_Checkpoint")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Delete the checkpoints of scripts whose answer has been stored
+    def delete_checkpoints(self, exam_id: int, student_ids: list):
+        try:
+            self.db.query(GradingCheckpointModel).filter(
+                GradingCheckpointModel.exam_id == exam_id,
+                GradingCheckpointModel.student_id.in_(student_ids),
+            ).delete(synchronize_session=False)
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Delete_Grading_Checkpoints")
+        finally:
+            conn.close(self.db)
+        return True
@@ -0,0 +1,173 @@
+from sqlalchemy import exc
+
+from backend.utils.db_conn import conn
+from backend.utils.errors import DatabaseError, NotFoundError
+from backend.models.models import GradingJobModel
+
+class GradingJobDao:
+    # own_session commits claims, progress and failures right away, outside the
+    # unit of work that stores the job's answer
+    def __init__(self, own_session: bool = False):
+        self.db = conn.new_session() if own_session else conn.get_db()
+
+    # Queue a new grading job
+    def create_job(self, student_id: int, exam_id: int, filename: str, file_path: str):
+        try:
+            job = GradingJobModel(student_id=student_id, exam_id=exam_id, file_name=filename, file_path=file_path, status="queued", progress=[])
+            self.db.add(job)
+            conn.commit(self.db)
+            self.db.refresh(job)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Create_Grading_Job")
+        finally:
+            conn.close(self.db)
+        return job
+
+    # Retrieve a grading job by ID
+    def get_job_by_id(self, id: int):
+        try:
+            job = self.db.query(GradingJobModel).filter(GradingJobModel.id == id).first()
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Grading_Job_By_Id")
+        finally:
+            conn.close(self.db)
+        if job is None:
+            raise NotFoundError("Grading Job doesnot exist!")
+        return job
+
+    # Retrieve all grading jobs of an exam
+    def get_jobs_by_exam_id(self, exam_id: int):
+        try:
+            jobs = self.db.query(GradingJobModel).filter(GradingJobModel.exam_id == exam_id).order_by(GradingJobModel.id).all()
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Grading_Jobs_By_Exam_Id")
+        finally:
+            conn.close(self.db)
+        return jobs
+
+    # Retrieve the spooled script paths of the jobs of an exam or a student
+    def get_job_file_paths(self, exam_id: int = None, student_id: int = None):
+        try:
+            query = self.db.query(GradingJobModel.file_path)
+            if exam_id is not None:
+                query = query.filter(GradingJobModel.exam_id == exam_id)
+            if student_id is not None:
+                query = query.filter(GradingJobModel.student_id == student_id)
+            file_paths = [file_path for (file_path,) in query.all()]
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Grading_Job_File_Paths")
+        finally:
+            conn.close(self.db)
+        return file_paths
+
+    # Atomically move the oldest queued job to running and return it
+    def claim_next_job(self):
+        try:
+            while True:
+                job = self.db.query(GradingJobModel).filter(GradingJobModel.status == "queued").order_by(GradingJobModel.id).first()
+                if job is None:
+                    return None
+                # another worker process may have claimed the same row in the meantime,
+                # the status guard makes the update a no-op for the loser
+                claimed = self.db.query(GradingJobModel).filter(GradingJobModel.id == job.id, GradingJobModel.status == "queued").update({
+                    GradingJobModel.status: "running",
+                    GradingJobModel.attempts: GradingJobModel.attempts + 1,
+                }, synchronize_session=False)
+                conn.commit(self.db)
+                if claimed:
+                    self.db.refresh(job)
+                    return job
+        except exc.OperationalError as error:
+            # sqlite reports a lock held by another worker this way, try again on the next poll
+            print(error)
+            conn.rollback(self.db)
+            return None
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Claim_Grading_Job")
+        finally:
+            conn.close(self.db)
+
+    # Record per-question progress of a running job
+    def update_progress(self, id: int, total_questions: int, completed_questions: int, progress: list):
+        try:
+            self.db.query(GradingJobModel).filter(GradingJobModel.id == id).update({
+                GradingJobModel.total_questions: total_questions,
+                GradingJobModel.completed_questions: completed_questions,
+                GradingJobModel.progress: progress,
+            }, synchronize_session=False)
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Update_Grading_Job_Progress")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Mark a job as done and link it to the stored answer
+    def complete_job(self, id: int, answer_id: int):
+        try:
+            self.db.query(GradingJobModel).filter(GradingJobModel.id == id).update({
+                GradingJobModel.status: "done",
+                GradingJobModel.answer_id: answer_id,
+            }, synchronize_session=False)
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Complete_Grading_Job")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Mark a job as failed with the reason
+    def fail_job(self, id: int, error_message: str):
+        try:
+            self.db.query(GradingJobModel).filter(GradingJobModel.id == id).update({
+                GradingJobModel.status: "failed",
+                GradingJobModel.error: error_message,
+            }, synchronize_session=False)
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Fail_Grading_Job")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Put a failed job back on the queue for another attempt
+    def retry_job(self, id: int, error_message: str):
+        try:
+            self.db.query(GradingJobModel).filter(GradingJobModel.id == id).update({
+                GradingJobModel.status: "queued",
+                GradingJobModel.error: error_message,
+            }, synchronize_session=False)
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Retry_Grading_Job")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Put jobs left running by a crashed worker back on the queue
+    def requeue_running_jobs(self):
+        try:
+            count = self.db.query(GradingJobModel).filter(GradingJobModel.status == "running").update({GradingJobModel.status: "queued"}, synchronize_session=False)
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Requeue_Grading_Jobs")
+        finally:
+            conn.close(self.db)
+        return count
@@ -0,0 +1,43 @@
+from sqlalchemy import exc
+
+from backend.utils.db_conn import conn
+from backend.utils.errors import DatabaseError
+from backend.models.models import RetrievalCacheModel
+
+class RetrievalCacheDao:
+    def __init__(self):
+        # a session of its own, cached retrieved passages are kept even when the request that stored them fails
+        self.db = conn.new_session()
+
+    # Retrieve the passages stored for one question of an exam
+    def get_passages(self, exam_id: int, context_key: str, question_no: int, k: int):
+        try:
+            entry = self.db.query(RetrievalCacheModel).filter(
+                RetrievalCacheModel.exam_id == exam_id,
+                RetrievalCacheModel.context_key == context_key,
+                RetrievalCacheModel.question_no == question_no,
+                RetrievalCacheModel.k == k,
+            ).first()
+        except Exception as error:
+            print(error)
+            raise DatabaseError("DB operation Failed: Get_Retrieval_Cache_Passages")
+        finally:
+            conn.close(self.db)
+        return entry.passages if entry else None
+
+    # Store the passages retrieved for one question of an exam
+    def put_passages(self, exam_id: int, context_key: str, question_no: int, k: int, passages: list):
+        try:
+            self.db.merge(RetrievalCacheModel(exam_id=exam_id, context_key=context_key, question_no=question_no, k=k, passages=passages))
+            conn.commit(self.db)
+        except exc.IntegrityError as error:
+            # another grader stored the same question first
+            print(error)
+            conn.rollback(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Put_Retrieval_Cache_Passages")
+        finally:
+            conn.close(self.db)
+        return True
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from sqlalchemy import exc
+
+from backend.utils.db_conn import conn
+from backend.utils.errors import DatabaseError
+from backend.models.models import SplitCacheModel
+
+class SplitCacheDao:
+    def __init__(self):
+        # a session of its own, cached split documents are kept even when the request that stored them fails
+        self.db = conn.new_session()
+
+    # Retrieve a cached split document, refreshing its position in the LRU order
+    def get_entry(self, cache_key: str):
+        try:
+            entry = self.db.query(SplitCacheModel).filter(SplitCacheModel.cache_key == cache_key).first()
+            if entry is None:
+                return None
+            entry.last_used_at = datetime.utcnow()
+            conn.commit(self.db)
+            result = entry.result
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Get_Split_Cache_Entry")
+        finally:
+            conn.close(self.db)
+        return result
+
+    # Store a split document
+    def put_entry(self, cache_key: str, result: list, path: str):
+        try:
+            self.db.merge(SplitCacheModel(cache_key=cache_key, result=result, path=path, created_at=datetime.utcnow(), last_used_at=datetime.utcnow()))
+            conn.commit(self.db)
+        except exc.IntegrityError as error:
+            # the same document was split concurrently and stored first
+            print(error)
+            conn.rollback(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Put_Split_Cache_Entry")
+        finally:
+            conn.close(self.db)
+        return True
+
+    # Evict the least recently used entries above max_entries
+    def evict_entries(self, max_entries: int):
+        try:
+            overflow = self.db.query(SplitCacheModel).count() - max_entries
+            if overflow <= 0:
+                return 0
+            # a plain list, IN does not take a LIMITed subquery on every backend
+            stale_keys = [row.cache_key for row in self.db.query(SplitCacheModel.cache_key).order_by(SplitCacheModel.last_used_at).limit(overflow)]
+            self.db.query(SplitCacheModel).filter(SplitCacheModel.cache_key.in_(stale_keys)).delete(synchronize_session=False)
+            conn.commit(self.db)
+        except Exception as error:
+            print(error)
+            conn.rollback(self.db)
+            raise DatabaseError("DB operation Failed: Evict_Split_Cache_Entries")
+        finally:
+            conn.close(self.db)
+        return len(stale_keys)
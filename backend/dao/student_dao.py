@@ -4,7 +4,8 @@ from sqlalchemy import exc
 
 from backend.utils.db_conn import conn
 from backend.utils.errors import DatabaseError, DuplicateError, NotFoundError
-from backend.models.models import StudentModel, AnswerModel
+from backend.models.models import StudentModel, AnswerModel, GradingJobModel, GradingCheckpointModel
+from backend.utils.pagination import keyset_page
 
 class StudentDao:
     """
@@ -20,11 +21,13 @@ class StudentDao:
         try:
             student = StudentModel(name=name, roll_no=roll_no, email=email, user_id=user_id)
             self.db.add(student)
-            self.db.flush()
+            conn.commit(self.db)
             self.db.refresh(student)
         except exc.IntegrityError:
+            conn.rollback(self.db)
             raise DuplicateError("A student with the same name, roll number, email, or user id already exists.")
         except Exception:
+            conn.rollback(self.db)
             raise DatabaseError("An error occurred while trying to create a new student.")
         return student
 
@@ -37,23 +40,32 @@ class StudentDao:
             raise NotFoundError(f"A student with id {student_id} does not exist.")
         return student
 
-    def get_students_by_user_id(self, user_id: int) -> List[StudentModel]:
+    def get_students_by_user_id(self, user_id: int, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[StudentModel]:
         """
-        Retrieve all student records associated with a specific user id
+        Retrieve the student records of a specific user id, one page at a time when limit is given
         """
         try:
-            students = self.db.query(StudentModel).filter(StudentModel.user_id == user_id).all()
+            query = self.db.query(StudentModel).filter(StudentModel.user_id == user_id)
+            students = keyset_page(query, StudentModel.id, after_id, limit).all()
         except Exception:
             raise DatabaseError(f"An error occurred while trying to retrieve students for user id {user_id}.")
         return students
 
     def delete_student(self, student_id: int) -> bool:
         """
-        Delete a student record and all its associated answer records
+        Delete a student record and all its associated grading job, answer and checkpoint records
         """
         student = self.db.query(StudentModel).filter(StudentModel.id == student_id).first()
         if student is None:
             raise NotFoundError(f"A student with id {student_id} does not exist.")
-        self.db.query(AnswerModel).filter(AnswerModel.student_id == student.id).delete()
-        self.db.delete(student)
+        try:
+            # jobs reference the answers, so they go first
+            self.db.query(GradingJobModel).filter(GradingJobModel.student_id == student.id).delete()
+            self.db.query(AnswerModel).filter(AnswerModel.student_id == student.id).delete()
+            self.db.query(GradingCheckpointModel).filter(GradingCheckpointModel.student_id == student.id).delete()
+            self.db.delete(student)
+            conn.commit(self.db)
+        except Exception:
+            conn.rollback(self.db)
+            raise DatabaseError(f"An error occurred while trying to delete the student with id {student_id}.")
         return True
@@ -14,16 +14,18 @@ class UserDao:
         try:
             user = UserModel(name=name, email=email, password=password)
             self.db.add(user)
-            self.db.commit()
+            conn.commit(self.db)
             self.db.refresh(user)
         except exc.IntegrityError as error:
             print(error)
+            conn.rollback(self.db)
             raise DuplicateError("Similar Record already exists!")
         except Exception as error:
             print(error)
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Create_User")
         finally:
-            self.db.close()
+            conn.close(self.db)
         print(user)
         return user
 
@@ -57,10 +59,11 @@ class UserDao:
                 user.name = name
                 user.email = email
                 user.password = password
-                self.db.commit()
+                conn.commit(self.db)
                 self.db.refresh(user)
         except Exception as error:
             print(error)
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Update_User")
         return user
 
@@ -71,8 +74,9 @@ class UserDao:
             if user is None:
                 raise NotFoundError("User doesnot exist!")
             self.db.delete(user)
-            self.db.commit()
+            conn.commit(self.db)
         except Exception as error:
             print(error)
+            conn.rollback(self.db)
             raise DatabaseError("DB operation Failed: Delete_User")
         return True
\ No newline at end of file
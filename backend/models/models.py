@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Float, Boolean, Table, JSON
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Float, Boolean, Table, JSON, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
@@ -23,10 +23,11 @@ class ExamModel(Base):
     conducted_date = Column(Date)
     description = Column(String(255))
     total_marks = Column(Float, nullable=False)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     answer_key = Column(JSON, default={})
     context_id = Column(Integer, ForeignKey('contexts.id'), nullable=True)
     file_name = Column(String(255), nullable=False)
+    retrieved_context = Column(JSON, nullable=True)
 
 # Define the Student model
 class StudentModel(Base):
@@ -36,14 +37,16 @@ class StudentModel(Base):
     name = Column(String(255), nullable=False)
     roll_no = Column(String(50), unique=True)
     email = Column(String(255), nullable=False, unique=True)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
 
 # Define the Answer model
 class AnswerModel(Base):
     __tablename__ = 'answers'
+    # serves the keyset pages of an exam's answers, which filter on exam_id and order by id
+    __table_args__ = (Index('ix_answers_exam_id_id', 'exam_id', 'id'),)
 
     id = Column(Integer, primary_key=True)
-    student_id = Column(Integer, ForeignKey('students.id'))
+    student_id = Column(Integer, ForeignKey('students.id'), index=True)
     exam_id = Column(Integer, ForeignKey('exams.id'))
     score = Column(Float, default=0.0)
     confidence = Column(Float, default=0.0)
@@ -57,10 +60,98 @@ class ContextModel(Base):
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
     comments = Column(String(255), nullable=True)
-    context_key = Column(String(255), nullable=False)
-    user_id = Column(Integer, ForeignKey('users.id'))
+    context_key = Column(String(255), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey('users.id'), index=True)
     file_name = Column(String(255), nullable=False)
-        
+    content_hash = Column(String(64), nullable=True, index=True)
+
+# Define the Grading Job model
+class GradingJobModel(Base):
+    __tablename__ = 'grading_jobs'
+    # the workers poll for the oldest queued job
+    __table_args__ = (Index('ix_grading_jobs_status_id', 'status', 'id'),)
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey('students.id'))
+    exam_id = Column(Integer, ForeignKey('exams.id'), index=True)
+    file_name = Column(String(255), nullable=False)
+    file_path = Column(String(1024), nullable=False)
+    status = Column(String(20), nullable=False, default='queued')
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    total_questions = Column(Integer, default=0)
+    completed_questions = Column(Integer, default=0)
+    progress = Column(JSON, default=[])
+    answer_id = Column(Integer, ForeignKey('answers.id'), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+# Define the Grade Cache model
+class GradeCacheModel(Base):
+    __tablename__ = 'grade_cache'
+
+    cache_key = Column(String(64), primary_key=True)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    last_used_at = Column(DateTime, server_default=func.now(), index=True)
+
+# Define the Grade Cache Stats model
+class GradeCacheStatsModel(Base):
+    __tablename__ = 'grade_cache_stats'
+
+    exam_id = Column(Integer, ForeignKey('exams.id'), primary_key=True)
+    hits = Column(Integer, default=0)
+    misses = Column(Integer, default=0)
+
+# Define the Grading Batch Stats model, totals of the batched prompts of an exam per GRADER_BATCH_SIZE
+class GradingBatchStatsModel(Base):
+    __tablename__ = 'grading_batch_stats'
+
+    exam_id = Column(Integer, ForeignKey('exams.id'), primary_key=True)
+    batch_size = Column(Integer, primary_key=True)
+    batches = Column(Integer, default=0)
+    items = Column(Integer, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    response_tokens = Column(Integer, default=0)
+    latency = Column(Float, default=0.0)
+    regraded = Column(Integer, default=0)
+
+# Define the Split Cache model
+class SplitCacheModel(Base):
+    __tablename__ = 'split_cache'
+
+    cache_key = Column(String(64), primary_key=True)
+    result = Column(JSON, nullable=False)
+    path = Column(String(20), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    last_used_at = Column(DateTime, server_default=func.now(), index=True)
+
+# Define the Retrieval Cache model
+class RetrievalCacheModel(Base):
+    __tablename__ = 'retrieval_cache'
+
+    exam_id = Column(Integer, ForeignKey('exams.id'), primary_key=True)
+    context_key = Column(String(255), primary_key=True)
+    question_no = Column(Integer, primary_key=True)
+    k = Column(Integer, primary_key=True)
+    passages = Column(JSON, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+# Define the Grading Checkpoint model
+class GradingCheckpointModel(Base):
+    __tablename__ = 'grading_checkpoints'
+
+    exam_id = Column(Integer, ForeignKey('exams.id'), primary_key=True)
+    student_id = Column(Integer, ForeignKey('students.id'), primary_key=True)
+    question_no = Column(Integer, primary_key=True)
+    input_hash = Column(String(64), nullable=False)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
 
+# Define the Schema Migration model
+class SchemaMigrationModel(Base):
+    __tablename__ = 'schema_migrations'
 
-    
\ No newline at end of file
+    version = Column(Integer, primary_key=True)
+    description = Column(String(255), nullable=False)
+    applied_at = Column(DateTime, server_default=func.now())
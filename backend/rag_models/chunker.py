@@ -0,0 +1,54 @@
+import re
+from typing import List, Tuple
+
+from langchain.docstore.document import Document
+
+# A token is a run of non-space characters together with the whitespace after it,
+# so joining consecutive tokens gives back the original text
+TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+
+class MultiGranularityChunker:
+    """
+    Splits documents into chunks of several sizes in a single pass.
+
+    Each document is tokenized once and every (chunk_size, chunk_overlap) pair,
+    measured in characters like the langchain splitters it replaces, is cut from
+    the same token list. Chunks whose text already appeared at another
+    granularity are dropped so they are embedded and stored only once.
+    """
+
+    def __init__(self, chunk_configs: List[Tuple[int, int]]):
+        self.chunk_configs = chunk_configs
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunks, seen = [], set()
+        for document in documents:
+            tokens = TOKEN_PATTERN.findall(document.page_content)
+            for chunk_size, chunk_overlap in self.chunk_configs:
+                for text in self._windows(tokens, chunk_size, chunk_overlap):
+                    key = " ".join(text.split())
+                    if not key or key in seen:
+                        continue
+                    seen.add(key)
+                    chunks.append(Document(page_content=text, metadata={**document.metadata, "chunk_size": chunk_size}))
+        return chunks
+
+    def _windows(self, tokens: List[str], chunk_size: int, chunk_overlap: int):
+        start = 0
+        while start < len(tokens):
+            end, length = start, 0
+            # always take at least one token so a token longer than chunk_size still makes progress
+            while end < len(tokens) and (end == start or length + len(tokens[end]) <= chunk_size):
+                length += len(tokens[end])
+                end += 1
+            yield "".join(tokens[start:end]).strip()
+            if end >= len(tokens):
+                break
+
+            # step back over whole tokens until the overlap is covered, but always move forward
+            next_start, overlap = end, 0
+            while next_start - 1 > start and overlap + len(tokens[next_start - 1]) <= chunk_overlap:
+                next_start -= 1
+                overlap += len(tokens[next_start])
+            start = next_start
@@ -0,0 +1,97 @@
+import threading
+
+import cohere
+import weaviate
+from langchain.embeddings import CohereEmbeddings
+from langchain.llms import Cohere
+
+from backend.config.config import config
+
+EMBED_MODEL = "embed-multilingual-v3.0"
+
+
+class ClientRegistry:
+    """
+    A singleton holding the process-wide Weaviate and Cohere clients.
+
+    The clients keep their HTTP sessions (and the TLS connections in them) alive,
+    so sharing them across requests saves the connection setup on every call.
+    setup() creates them at server startup; processes that never call it, such as
+    the grading workers or the Streamlit pages, create them on first use.
+    """
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super().__new__(cls, *args, **kwargs)
+            cls._instance._lock = threading.RLock()
+            cls._instance._clients = {}
+        return cls._instance
+
+    def setup(self) -> None:
+        """
+        Creates every client up front and removes the leftover WikipediaLangChain class once.
+        """
+        try:
+            self.get_cohere_client()
+            self.get_embeddings()
+            self.get_llm()
+            if config.VECTOR_BACKEND == "weaviate":
+                self.get_weaviate_client().schema.delete_class("WikipediaLangChain")
+        except Exception as error:
+            # the server can still start, whatever failed here is retried on first use
+            print(error)
+
+    def get_weaviate_client(self) -> weaviate.Client:
+        return self._get("weaviate", lambda: weaviate.Client(
+            url=config.WEAVIATE_URL,
+            auth_client_secret=weaviate.AuthApiKey(api_key=config.WEAVIATE_API_KEY),
+            additional_headers={
+                "X-Cohere-Api-Key": config.COHERE_API_KEY,
+            },
+            # weaviate-client v3 takes the session pool settings through additional_config
+            additional_config=weaviate.Config(
+                connection_config=weaviate.ConnectionConfig(
+                    session_pool_connections=config.CLIENT_POOL_CONNECTIONS,
+                    session_pool_maxsize=config.CLIENT_POOL_MAXSIZE,
+                ),
+            ),
+        ))
+
+    def get_cohere_client(self) -> cohere.Client:
+        return self._get("cohere", lambda: cohere.Client(config.COHERE_API_KEY))
+
+    def get_embeddings(self) -> CohereEmbeddings:
+        return self._get("embeddings", lambda: CohereEmbeddings(model=EMBED_MODEL, cohere_api_key=config.COHERE_API_KEY))
+
+    def get_llm(self) -> Cohere:
+        return self._get("llm", lambda: Cohere(cohere_api_key=config.COHERE_API_KEY, temperature=0))
+
+    def close(self) -> None:
+        """
+        Closes the clients and drops them, they are created again on next use.
+        """
+        with self._lock:
+            for name, client in self._clients.items():
+                try:
+                    self._close_client(client)
+                except Exception as error:
+                    print(f"Could not close the {name} client: {error}")
+            self._clients.clear()
+
+    def _close_client(self, client) -> None:
+        close = getattr(client, "close", None)
+        if callable(close):
+            close()
+        elif hasattr(client, "_connection"):
+            # weaviate-client v3 has no Client.close(), its connection holds the HTTP session
+            client._connection.close()
+
+    def _get(self, name, factory):
+        with self._lock:
+            if name not in self._clients:
+                self._clients[name] = factory()
+            return self._clients[name]
+
+
+clients = ClientRegistry()
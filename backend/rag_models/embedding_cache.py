@@ -0,0 +1,162 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from backend.config.config import config
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of chunk embeddings for one embedding model.
+
+    Vectors are appended as raw float32 rows to vectors-<generation>.f32 and
+    every new row appends a "<hash of the normalized chunk text> <row>" line to
+    index-<generation>.log, so an insert never rewrites what is already stored.
+    meta.json records the vector dimension and the current generation.
+
+    Once the cache holds more than EMBED_CACHE_MAX_ENTRIES vectors, the oldest
+    are dropped: the newest three quarters are copied into the files of the next
+    generation, which becomes current when meta.json is replaced. Writers take
+    an exclusive file lock and readers a shared one, so several API processes
+    can share the same cache directory.
+    """
+
+    def __init__(self, model_name, cache_dir=None):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.directory = os.path.join(cache_dir or config.EMBED_CACHE_DIR, safe_name)
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, ".lock")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # the part of the index log of _generation read so far
+        self._generation = None
+        self._dim = None
+        self._rows = {}
+        self._index_offset = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_many(self, texts):
+        """
+        Returns the cached vector of every text, or None where it has not been embedded yet.
+        """
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            self._refresh()
+            rows = [self._rows.get(self._key(text)) for text in texts]
+            found = [row for row in rows if row is not None]
+            vectors = self._read_rows(found) if found else {}
+            self.hits += len(found)
+            self.misses += len(rows) - len(found)
+        return [vectors[row] if row is not None else None for row in rows]
+
+    def put_many(self, texts, vectors):
+        """
+        Appends new vectors to the store, texts already cached by another process are skipped.
+        """
+        if not texts:
+            return
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # pick up rows appended by other processes since this instance last read the index
+            self._refresh()
+            matrix = np.asarray(vectors, dtype=np.float32)
+            if self._dim is None:
+                self._dim = int(matrix.shape[1])
+                self._generation = 0
+                self._write_meta()
+
+            # rows are numbered from the file size, not the index, so rows left behind by a
+            # writer that died before appending to the index never get mixed up with new ones
+            vectors_path = self._vectors_path(self._generation)
+            stored_bytes = os.path.getsize(vectors_path) if os.path.exists(vectors_path) else 0
+            new_keys, new_rows, next_row = {}, [], stored_bytes // (4 * self._dim)
+            for text, vector in zip(texts, matrix):
+                key = self._key(text)
+                if key in self._rows or key in new_keys:
+                    continue
+                new_keys[key] = next_row + len(new_rows)
+                new_rows.append(vector)
+
+            if new_rows:
+                with open(vectors_path, "ab") as vectors_file:
+                    np.stack(new_rows).astype(np.float32).tofile(vectors_file)
+                lines = "".join(f"{key} {row}\n" for key, row in new_keys.items())
+                with open(self._index_path(self._generation), "a") as index_file:
+                    index_file.write(lines)
+                self._refresh()
+
+            if config.EMBED_CACHE_MAX_ENTRIES and len(self._rows) > config.EMBED_CACHE_MAX_ENTRIES:
+                self._compact(config.EMBED_CACHE_MAX_ENTRIES * 3 // 4)
+
+    def _refresh(self):
+        # callers hold the file lock
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path) as meta_file:
+            meta = json.load(meta_file)
+        if meta["generation"] != self._generation:
+            self._generation, self._dim = meta["generation"], meta["dim"]
+            self._rows, self._index_offset = {}, 0
+
+        index_path = self._index_path(self._generation)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "rb") as index_file:
+            index_file.seek(self._index_offset)
+            appended = index_file.read()
+        # a line cut short by a writer that died is ignored until it is completed
+        complete = appended[:appended.rfind(b"\n") + 1]
+        for line in complete.decode("utf-8").splitlines():
+            key, _, row = line.partition(" ")
+            if row.isdigit():
+                self._rows[key] = int(row)
+        self._index_offset += len(complete)
+
+    def _compact(self, keep):
+        # the newest rows are the highest numbered ones
+        kept = sorted(self._rows.items(), key=lambda item: item[1])[-keep:]
+        old_generation, generation = self._generation, self._generation + 1
+        matrix = np.memmap(self._vectors_path(old_generation), dtype=np.float32, mode="r").reshape(-1, self._dim)
+        np.asarray(matrix[[row for _, row in kept]], dtype=np.float32).tofile(self._vectors_path(generation))
+        with open(self._index_path(generation), "w") as index_file:
+            index_file.write("".join(f"{key} {row}\n" for row, (key, _) in enumerate(kept)))
+        del matrix
+
+        self._generation = generation
+        self._write_meta()
+        os.remove(self._vectors_path(old_generation))
+        os.remove(self._index_path(old_generation))
+        self._generation, self._rows, self._index_offset = None, {}, 0
+        self._refresh()
+        print(f"Embedding cache {self.directory}: kept the newest {len(self._rows)} vectors")
+
+    def _write_meta(self):
+        temp_path = f"{self.meta_path}.tmp"
+        with open(temp_path, "w") as meta_file:
+            json.dump({"dim": self._dim, "generation": self._generation}, meta_file)
+        os.replace(temp_path, self.meta_path)
+
+    def _read_rows(self, rows):
+        matrix = np.memmap(self._vectors_path(self._generation), dtype=np.float32, mode="r").reshape(-1, self._dim)
+        return {row: matrix[row].tolist() for row in rows}
+
+    def _vectors_path(self, generation):
+        return os.path.join(self.directory, f"vectors-{generation}.f32")
+
+    def _index_path(self, generation):
+        return os.path.join(self.directory, f"index-{generation}.log")
+
+    def _key(self, text):
+        normalized = " ".join(text.split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import re
+import threading
+
+from backend.config.config import config
+from backend.dao.grade_cache_dao import GradeCacheDao
+
+# puts since the last eviction, shared by every GradeCache of the process
+_puts_since_eviction = 0
+_eviction_lock = threading.Lock()
+
+
+class GradeCache:
+    """
+    Persistent cache of grader results keyed by the content that was graded.
+
+    The cache is trimmed to GRADE_CACHE_MAX_ENTRIES, least recently used first,
+    every GRADE_CACHE_EVICT_INTERVAL puts.
+
+    The key covers the question, answer key, normalized student answer, the
+    context used for retrieval and the prompt version, so changing any of them
+    produces a fresh LLM call. Hits and misses are counted per instance.
+    """
+
+    def __init__(self, context_key, prompt_version):
+        self.context_key = context_key
+        self.prompt_version = prompt_version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def make_key(self, item):
+        payload = json.dumps([
+            self.prompt_version,
+            self.context_key,
+            item['question'],
+            item['answer_key'],
+            self._normalize(item['student_answer']),
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        if not config.GRADE_CACHE_ENABLED:
+            return None
+        try:
+            result = GradeCacheDao(own_session=True).get_entry(key, ttl_seconds=config.GRADE_CACHE_TTL_SECONDS)
+        except Exception as error:
+            # a broken cache must never stop grading, treat it as a miss
+            print(error)
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, key, result):
+        if not config.GRADE_CACHE_ENABLED:
+            return
+        try:
+            GradeCacheDao(own_session=True).put_entry(key, result)
+            if self._eviction_due():
+                GradeCacheDao(own_session=True).evict_entries(config.GRADE_CACHE_MAX_ENTRIES)
+        except Exception as error:
+            print(error)
+
+    def _eviction_due(self):
+        # counting the table on every put would scan it each time, so the
+        # cache may exceed its size by up to GRADE_CACHE_EVICT_INTERVAL entries
+        global _puts_since_eviction
+        if not config.GRADE_CACHE_MAX_ENTRIES:
+            return False
+        with _eviction_lock:
+            _puts_since_eviction += 1
+            if _puts_since_eviction < config.GRADE_CACHE_EVICT_INTERVAL:
+                return False
+            _puts_since_eviction = 0
+        return True
+
+    def _normalize(self, text):
+        return re.sub(r"\s+", " ", text or "").strip().lower()
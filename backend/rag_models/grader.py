@@ -1,6 +1,9 @@
 import os
+import threading
+import time
 import weaviate
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain.llms import Cohere
 from langchain.embeddings import CohereEmbeddings
 from backend.config.config import config
@@ -13,106 +16,409 @@ from langchain.document_loaders import TextLoader
 from langchain.retrievers.document_compressors import CohereRerank
 from langchain.chains import RetrievalQA
 import cohere
+from backend.rag_models.grade_cache import GradeCache
+from backend.rag_models.response_parser import parse_json
+from backend.rag_models.rate_limiter import cohere_limiter, estimate_tokens
+from backend.utils.errors import ModelError
+from backend.rag_models.vector_backends import get_vector_backend
+from backend.rag_models.clients import clients
+from backend.dao.retrieval_cache_dao import RetrievalCacheDao
+from langchain.docstore.document import Document
 
+# Bump whenever the grading prompts change so cached grades from the old prompt are not reused
+PROMPT_VERSION = "2"
 
-class GraderCohere:
-    def __init__(self, class_name):
 
-        cohere_api_key = config.COHERE_API_KEY
-        weaviate_api_key = config.WEAVIATE_API_KEY
-        weaviate_url = config.WEAVIATE_URL
+class RetryBudget:
+    """
+    The GRADER_RETRY_BUDGET extra attempts shared by the questions of one grade() call.
+    """
+
+    def __init__(self, retries):
+        self._retries_left = retries
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            if self._retries_left <= 0:
+                return False
+            self._retries_left -= 1
+            return True
+
+
+class GraderCohere:
+    def __init__(self, class_name, exam_id=None, retrieved_context=None):
 
         self.class_name = class_name
+        self.exam_id = exam_id
         self.no_of_k = 10
+        self.cache = GradeCache(class_name, PROMPT_VERSION)
+        # keyed by str(question no), the key type ExamCore stores the precomputed passages under
+        self._passages = {}
+        # passages stored with the exam at creation time, only valid for the context and k they were retrieved with
+        if retrieved_context and retrieved_context.get("context_key") == class_name and retrieved_context.get("k") == self.no_of_k:
+            for no, passages in (retrieved_context.get("passages") or {}).items():
+                try:
+                    self._passages[str(no)] = [Document(page_content=p["page_content"], metadata=p["metadata"]) for p in passages]
+                except (KeyError, TypeError) as error:
+                    # a malformed entry is searched again on first use instead
+                    print(f"Ignoring precomputed passages of question {no}: {error!r}")
+        self._passage_locks = {}
+        self._passages_lock = threading.Lock()
+        # tokens and latency of every batched prompt, see GRADER_BATCH_SIZE, added to
+        # the exam totals by AnswerCore.record_grading_stats
+        self.batch_stats = []
+        self._stats_lock = threading.Lock()
 
-        self.client=weaviate.Client(
-            url=weaviate_url,
-            auth_client_secret=weaviate.AuthApiKey(api_key=weaviate_api_key),
-
-            additional_headers={
-                "X-Cohere-Api-Key": cohere_api_key,
-            }
-        )
+        # the clients are shared by the whole process, only the chain is built per grader
+        self.client = clients.get_weaviate_client() if config.VECTOR_BACKEND == "weaviate" else None
         if class_name is not None:
-            _weaviate = Weaviate(self.client, self.class_name, "text").as_retriever(
-                search_kwargs={"k": self.no_of_k}
+            self.retriever = get_vector_backend(self.client).as_retriever(
+                self.class_name, clients.get_embeddings(), self.no_of_k
             )
             self.chain = RetrievalQA.from_chain_type(
-                llm=Cohere(cohere_api_key = cohere_api_key,temperature=0), retriever=_weaviate
+                llm=clients.get_llm(), retriever=self.retriever
             )
         else:
-            self.chain = cohere.Client(cohere_api_key)
+            self.chain = clients.get_cohere_client()
 
-    def grade(self, list_json):
-        
-        print(list_json)
+    def retrieve_passages(self, item):
+        """
+        Returns the context passages of an exam question, searching the vector store only once per question.
+
+        Passages depend on the question and answer key alone, so every script of the
+        exam reuses them: first from this grader's memory, then from the retrieval
+        cache table keyed by (exam, context_key, question no, k).
+        """
+        question_no = item.get('no')
+        # question numbers can be strings like "1a", they are looked up the way they are stored
+        key = str(question_no) if question_no is not None else item['question']
+        with self._passages_lock:
+            key_lock = self._passage_locks.setdefault(key, threading.Lock())
 
-        graded = []
-        print("hello12345")
+        # concurrent scripts asking for the same question wait for the first search
+        with key_lock:
+            if key in self._passages:
+                return self._passages[key]
+
+            # the retrieval cache table only holds integer question numbers
+            use_table = self.exam_id is not None and isinstance(question_no, int)
+            passages = None
+            if use_table:
+                passages = RetrievalCacheDao().get_passages(self.exam_id, self.class_name, question_no, self.no_of_k)
+            if passages is None:
+                passages = self.search_passages(item)
+                if use_table:
+                    RetrievalCacheDao().put_passages(self.exam_id, self.class_name, question_no, self.no_of_k, passages)
+
+            self._passages[key] = [Document(page_content=p["page_content"], metadata=p["metadata"]) for p in passages]
+            return self._passages[key]
+
+    def search_passages(self, item):
+        """
+        Searches the vector store for the passages of a question, as JSON-serializable dicts.
+        """
+        query = f"{item['question']}\n{item['answer_key']}"
+        # the query is embedded by Cohere, locally or by Weaviate's text2vec-cohere module
+        documents = cohere_limiter.call(lambda: self.retriever.get_relevant_documents(query), tokens=estimate_tokens(query))
+        return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+
+    def _grade_item(self, item, budget):
+        cache_key = self.cache.make_key(item)
+        graded = self.cache.get(cache_key)
+        if graded is None:
+            graded = self._grade_with_model(item, budget)
+            self.cache.put(cache_key, graded)
+        return graded
+
+    def _grade_with_model(self, item, budget):
+        """
+        Grades one question, asking again while the reply is unusable.
+
+        Every question gets up to GRADER_MAX_RETRIES extra attempts, all questions
+        of a grade() call share the budget of GRADER_RETRY_BUDGET of them. Raises
+        ModelError once the question is out of attempts.
+        """
+        attempt = 0
+        while True:
+            try:
+                result = self._valid_result(parse_json(self._ask_model(item), dict))
+                if result is not None:
+                    return result
+                error = ValueError("Marks or Justification missing or invalid")
+            except Exception as ask_error:
+                error = ask_error
+            print(f"Grading attempt {attempt + 1} failed: {error}")
+            attempt += 1
+            if attempt > config.GRADER_MAX_RETRIES or not budget.take():
+                raise ModelError(f"Could not grade question: {error}")
+
+    def _valid_result(self, entry):
+        """
+        Returns the Marks and Justification of a parsed reply, None if they are missing or out of range.
+        """
+        if not isinstance(entry, dict):
+            return None
+        try:
+            marks = float(entry["Marks"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if 0 <= marks <= 5 and isinstance(entry.get("Justification"), str):
+            return {"Marks": entry["Marks"], "Justification": entry["Justification"]}
+        return None
+
+    def _ask_model(self, item):
         if self.class_name is not None:
-            for item in list_json:
+            p1 = f""" 
+                ```
+                Question: 
+                    {item['question']}
+                Answer Key: 
+                    {item['answer_key']}
+                Student Answer: 
+                    {item['student_answer']}
+                ```
                 
-                p1 = f""" 
-                    ```
-                    Question: 
-                        {item['question']}
-                    Answer Key: 
-                        {item['answer_key']}
-                    Student Answer: 
-                        {item['student_answer']}
-                    ```
+                Below is the Task to be performed
+                    Refer to the text inside triple backtickets that contain Question, Answer Key and Student Answer. 
+                    Grade leniently the Student Answer out of 5 marks, with 5 being maximum mark awarded for a correct answer and 0 being the minimum mark awarded for a completely wrong answer. 
+                    Partial marks can also be awarded if the answer is partially correct. 
+                    Mention the mark and explain with proper justification for awarding or not awarding marks.
+                    Prompt: Can you respond only by printing in the following json output format which could be converted into json without any errors:
                     
-                    Below is the Task to be performed
-                        Refer to the text inside triple backtickets that contain Question, Answer Key and Student Answer. 
-                        Grade leniently the Student Answer out of 5 marks, with 5 being maximum mark awarded for a correct answer and 0 being the minimum mark awarded for a completely wrong answer. 
-                        Partial marks can also be awarded if the answer is partially correct. 
-                        Mention the mark and explain with proper justification for awarding or not awarding marks.
-                        Prompt: Can you respond only by printing in the following json output format which could be converted into json without any errors:
-                        
-                        output format:
-                            {{"Marks": <insert awarded marks after evaluation>,
-                             "Justification": <insert justification>,
-                            }}
-                """ 
-                print(p1)
-                # p1 = "Question: "+item['question']+"\nAnswer Key: "+item['answer_key']+"\nStudent Answer: "+item['student_answer']+"\n Grade leniently the Student Answer out of 5 marks, with 5 being maximum mark awarded for a correct answer and 0 being the minimum mark awarded for a completely wrong answer. Partial marks can also be awarded if the answer is partially correct. Mention the mark and explain with proper justification for awarding or not awarding marks.\n Prompt: Can you respond only by printing in the following json format which could be converted into json without any errors:\n  \n{\"Marks\": ,\n\"Justification\": ,\n}\n \n"
-                response = self.chain({"query": p1})['result']
-                print(response)
-                resp = json.loads(response)
-                graded.append(resp)
-        else:
-            for item in list_json:
-                p1 = f""" 
-                    ```
-                    Question: 
-                        {item['question']}
-                    Answer Key: 
-                        {item['answer_key']}
-                    Student Answer: 
-                        {item['student_answer']}
-                    ```
+                    output format:
+                        {{"Marks": <insert awarded marks after evaluation>,
+                         "Justification": <insert justification>,
+                        }}
+            """ 
+            # the "stuff" chain of RetrievalQA answers over the passages retrieved once for this question
+            documents = self.retrieve_passages(item)
+            response = cohere_limiter.call(
+                lambda: self.chain.combine_documents_chain.run(input_documents=documents, question=p1),
+                tokens=estimate_tokens(p1, *[doc.page_content for doc in documents])
+            )
+            print(response)
+            return response
+
+        p1 = f""" 
+            ```
+            Question: 
+                {item['question']}
+            Answer Key: 
+                {item['answer_key']}
+            Student Answer: 
+                {item['student_answer']}
+            ```
+            
+            Below is the Task to be performed
+                Refer to the text inside triple backtickets that contain Question, Answer Key and Student Answer. 
+                Grade leniently the Student Answer out of 5 marks, with 5 being maximum mark awarded for a correct answer and 0 being the minimum mark awarded for a completely wrong answer. 
+                Partial marks can also be awarded if the answer is partially correct. 
+                Mention the mark and explain with proper justification for awarding or not awarding marks.
+                Prompt: Can you respond only by printing in the following json format which could be converted into json without any errors:
+                {{\"Marks\": ,\n\"Justification\": ,\n}}
+        """ 
+        response = cohere_limiter.call(lambda: self.chain.generate(
+            model='command',
+            prompt=p1,
+            max_tokens=2000,
+            temperature=0,
+            k=10,
+            stop_sequences=[],
+            return_likelihoods='NONE'), tokens=estimate_tokens(p1))
+
+        return response.generations[0].text
+
+    def _grade_batched(self, list_json, graded, progress_callback, max_workers, budget):
+        """
+        Grades the questions GRADER_BATCH_SIZE at a time, one prompt per batch.
+
+        Cached questions are not sent at all. Items of a batch whose result is
+        missing or invalid in the returned JSON array are graded again one by one.
+        """
+        pending = []
+        for i, item in enumerate(list_json):
+            if graded[i] is not None:
+                continue
+            graded[i] = self.cache.get(self.cache.make_key(item))
+            if graded[i] is None:
+                pending.append(i)
+            elif progress_callback is not None:
+                progress_callback(i, len(list_json), graded[i])
+
+        batches = [pending[start:start + config.GRADER_BATCH_SIZE] for start in range(0, len(pending), config.GRADER_BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            futures = [executor.submit(self._grade_batch, [list_json[i] for i in batch], budget) for batch in batches]
+            for batch, future in zip(batches, futures):
+                for i, result in zip(batch, future.result()):
+                    graded[i] = result
+                    if result is not None and progress_callback is not None:
+                        progress_callback(i, len(list_json), graded[i])
+
+    def _grade_batch(self, items, budget):
+        """
+        Grades a batch of questions with one prompt and returns their results in order.
+        """
+        questions = "\n".join(
+            f"""
+                Item {n}:
+                ```
+                Question: 
+                    {item['question']}
+                Answer Key: 
+                    {item['answer_key']}
+                Student Answer: 
+                    {item['student_answer']}
+                ```"""
+            for n, item in enumerate(items, start=1)
+        )
+        p1 = f""" 
+                {questions}
+                
+                Below is the Task to be performed
+                    Each numbered Item above contains, inside triple backtickets, a Question, its Answer Key and the Student Answer. 
+                    For every Item, grade leniently the Student Answer out of 5 marks, with 5 being maximum mark awarded for a correct answer and 0 being the minimum mark awarded for a completely wrong answer. 
+                    Partial marks can also be awarded if the answer is partially correct. 
+                    Mention the mark and explain with proper justification for awarding or not awarding marks.
+                    Prompt: Can you respond only by printing a json array with one object per Item, in Item order, which could be converted into json without any errors:
                     
-                    Below is the Task to be performed
-                        Refer to the text inside triple backtickets that contain Question, Answer Key and Student Answer. 
-                        Grade leniently the Student Answer out of 5 marks, with 5 being maximum mark awarded for a correct answer and 0 being the minimum mark awarded for a completely wrong answer. 
-                        Partial marks can also be awarded if the answer is partially correct. 
-                        Mention the mark and explain with proper justification for awarding or not awarding marks.
-                        Prompt: Can you respond only by printing in the following json format which could be converted into json without any errors:
-                        {{\"Marks\": ,\n\"Justification\": ,\n}}
-                """ 
-                print(p1)
-                # p1 = "Question: "+item['question']+"\nAnswer Key: "+item['answer_key']+"\nStudent Answer: "+item['student_answer']+"\n Grade leniently the Student Answer out of 5 marks, with 5 being maximum mark awarded for a correct answer and 0 being the minimum mark awarded for a completely wrong answer. Partial marks can also be awarded if the answer is partially correct. Mention the mark and explain with proper justification for awarding or not awarding marks.\n Prompt: Can you respond only by printing in the following json format which could be converted into json without any errors:\n  \n{\"Marks\": ,\n\"Justification\": ,\n}\n \n"
-                response = self.chain.generate(
+                    output format:
+                        [{{"Item": <insert item number>,
+                          "Marks": <insert awarded marks after evaluation>,
+                          "Justification": <insert justification>
+                        }}]
+            """
+
+        start = time.perf_counter()
+        try:
+            if self.class_name is not None:
+                # the passages of every question in the batch, each passage only once
+                documents, seen = [], set()
+                for item in items:
+                    for doc in self.retrieve_passages(item):
+                        if doc.page_content not in seen:
+                            seen.add(doc.page_content)
+                            documents.append(doc)
+                prompt_tokens = estimate_tokens(p1, *[doc.page_content for doc in documents])
+                response = cohere_limiter.call(
+                    lambda: self.chain.combine_documents_chain.run(input_documents=documents, question=p1),
+                    tokens=prompt_tokens
+                )
+            else:
+                prompt_tokens = estimate_tokens(p1)
+                response = cohere_limiter.call(lambda: self.chain.generate(
                     model='command',
                     prompt=p1,
                     max_tokens=2000,
                     temperature=0,
                     k=10,
                     stop_sequences=[],
-                    return_likelihoods='NONE')
-            
-                resp = json.loads(response.generations[0].text)
-                graded.append(resp)
+                    return_likelihoods='NONE'), tokens=prompt_tokens).generations[0].text
+        except Exception as error:
+            # every item of the batch is then graded one by one
+            print(error)
+            response, prompt_tokens = "", estimate_tokens(p1)
+        elapsed = time.perf_counter() - start
+        print(response)
+
+        results = self._parse_batch(response, len(items))
+        failed = [n for n, result in enumerate(results) if result is None]
+        stats = {
+            "batch_size": len(items),
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": len(response.split()),
+            "latency": elapsed,
+            "failed_items": len(failed),
+        }
+        with self._stats_lock:
+            self.batch_stats.append(stats)
+        print(f"Graded batch of {len(items)} questions in {elapsed:.2f}s "
+              f"({prompt_tokens} prompt tokens, {stats['response_tokens']} response tokens, {len(failed)} regraded)")
+
+        for n, item in enumerate(items):
+            if results[n] is None:
+                try:
+                    results[n] = self._grade_with_model(item, budget)
+                except ModelError as error:
+                    # left as None, grade() reports it once every other question is done
+                    print(error)
+                    continue
+            self.cache.put(self.cache.make_key(item), results[n])
+        return results
+
+    def batch_totals(self):
+        """
+        Returns the batch_stats of this grader added up, in the shape GradingBatchStatsDao.record_stats takes.
+        """
+        with self._stats_lock:
+            stats = list(self.batch_stats)
+        return {
+            "batches": len(stats),
+            "items": sum(batch["batch_size"] for batch in stats),
+            "prompt_tokens": sum(batch["prompt_tokens"] for batch in stats),
+            "response_tokens": sum(batch["response_tokens"] for batch in stats),
+            "latency": sum(batch["latency"] for batch in stats),
+            "regraded": sum(batch["failed_items"] for batch in stats),
+        }
+
+    def _parse_batch(self, response, no_of_items):
+        """
+        Returns the result of each item of a batch response, None where it is missing or invalid.
+        """
+        results = [None] * no_of_items
+        try:
+            parsed = parse_json(response, list)
+        except ValueError as error:
+            print(error)
+            return results
+
+        for position, entry in enumerate(parsed):
+            if not isinstance(entry, dict):
+                continue
+            # trust the item number when there is one, the position otherwise
+            n = entry.get("Item", position + 1)
+            if isinstance(n, int) and 1 <= n <= no_of_items:
+                results[n - 1] = self._valid_result(entry)
+        return results
+
+    def grade(self, list_json, progress_callback=None, completed=None, max_workers=None):
+        
+        print(list_json)
+
+        # graded[i] is filled by index so it still lines up with list_json[i]
+        # even though the calls finish out of order. progress_callback is
+        # invoked from this thread, never from the pool, so it can touch the db.
+        # completed maps indices to results checkpointed by an earlier attempt,
+        # those questions are not graded again
+        graded = [None] * len(list_json)
+        for i, result in (completed or {}).items():
+            graded[i] = result
+            if progress_callback is not None:
+                progress_callback(i, len(list_json), graded[i])
+        # one budget per call, batch uploads share this grader across scripts graded at once
+        budget = RetryBudget(config.GRADER_RETRY_BUDGET)
+        # callers grading several scripts at once pass their share of GRADER_MAX_WORKERS
+        max_workers = config.GRADER_MAX_WORKERS if max_workers is None else max_workers
+        if config.GRADER_BATCH_SIZE > 1:
+            self._grade_batched(list_json, graded, progress_callback, max_workers, budget)
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(list_json)))) as executor:
+                futures = {executor.submit(self._grade_item, item, budget): i for i, item in enumerate(list_json) if graded[i] is None}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        graded[i] = future.result()
+                    except ModelError as error:
+                        print(error)
+                        continue
+                    if progress_callback is not None:
+                        progress_callback(i, len(list_json), graded[i])
+
+        # the graded questions are already in the grade cache, so grading the
+        # script again only sends the failed ones back to the model
+        failed = [i + 1 for i in range(len(list_json)) if graded[i] is None]
+        if failed:
+            raise ModelError(f"Could not grade questions {failed} of {len(list_json)}, the others are kept for the retry")
 
         grad_complete = []
         total_marks = 0
@@ -4,17 +4,85 @@ import re
 import json
 from backend.config.config import config
 from backend.utils.errors import ModelError
+from backend.dao.split_cache_dao import SplitCacheDao
+from backend.rag_models.rule_splitter import RuleBasedSplitter
+from backend.rag_models.clients import clients
+from backend.rag_models.rate_limiter import cohere_limiter, estimate_tokens
+import hashlib
+import threading
+
+# Bump whenever the splitting prompt or parsing changes so cached splits from the old version are not reused
+SPLITTER_VERSION = "3"
+
+# puts since the last eviction, shared by every QuestionSplitter of the process
+_puts_since_eviction = 0
+_eviction_lock = threading.Lock()
 
 class QuestionSplitter:
     def __init__(self):
 
         self.api_key = config.COHERE_API_KEY
-        # Initialize the Cohere client in the constructor
-        self.co = cohere.Client(self.api_key)
+        # The Cohere client is shared by the whole process, see ClientRegistry
+        self.co = clients.get_cohere_client()
+        # how the last document was split: "cache", "rules" or "llm"
+        self.last_path = None
 
     # Make sure to include 'self' as the first parameter in instance methods
     def splitter(self, text):
 
+        # identical documents are split once, the LLM call is slow and not deterministic
+        cache_key = hashlib.sha256(f"{SPLITTER_VERSION}\n{text}".encode("utf-8")).hexdigest()
+        json_data = self._get_cached(cache_key)
+        if json_data is not None:
+            self.last_path = "cache"
+            return json_data
+
+        # regularly numbered documents are split locally, the LLM is only asked when the rules are unsure
+        json_data, confidence = RuleBasedSplitter().split(text)
+        if confidence >= config.SPLIT_RULES_MIN_CONFIDENCE:
+            self.last_path = "rules"
+        else:
+            json_data = self._split_with_model(text)
+            self.last_path = "llm"
+        print(f"QuestionSplitter: {cache_key[:12]} split by {self.last_path} (rule confidence {confidence:.2f})")
+
+        self._put_cached(cache_key, json_data, self.last_path)
+        return json_data
+
+    def _get_cached(self, cache_key):
+        if not config.SPLIT_CACHE_ENABLED:
+            return None
+        try:
+            return SplitCacheDao().get_entry(cache_key)
+        except Exception as error:
+            print(error)
+            return None
+
+    def _put_cached(self, cache_key, json_data, path):
+        if not config.SPLIT_CACHE_ENABLED:
+            return
+        try:
+            SplitCacheDao().put_entry(cache_key, json_data, path=path)
+            if self._eviction_due():
+                SplitCacheDao().evict_entries(config.SPLIT_CACHE_MAX_ENTRIES)
+        except Exception as error:
+            print(error)
+
+    def _eviction_due(self):
+        # counting the table on every put would scan it each time, so the
+        # cache may exceed its size by up to SPLIT_CACHE_EVICT_INTERVAL entries
+        global _puts_since_eviction
+        if not config.SPLIT_CACHE_MAX_ENTRIES:
+            return False
+        with _eviction_lock:
+            _puts_since_eviction += 1
+            if _puts_since_eviction < config.SPLIT_CACHE_EVICT_INTERVAL:
+                return False
+            _puts_since_eviction = 0
+        return True
+
+    def _split_with_model(self, text):
+
         prompt = f"""
             Please examine the given text in triple backticks and extract information for creating a JSON-formatted output. 
             The text may present in diverse formats, including but not limited to question-answer pairs, answers only, numbered questions with answers, or questions labeled in different ways 
@@ -30,7 +98,7 @@ class QuestionSplitter:
             ```
             """
             
-        response = self.co.generate(
+        response = cohere_limiter.call(lambda: self.co.generate(
             model='command',
             prompt=prompt,
             max_tokens=1000,
@@ -38,7 +106,7 @@ class QuestionSplitter:
             k=10,
             stop_sequences=[],
             return_likelihoods='NONE'
-        )
+        ), tokens=estimate_tokens(prompt))
         
         extracted_response = response.generations[0].text
 
@@ -0,0 +1,221 @@
+import fcntl
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from backend.config.config import config
+
+RETRYABLE_ERRORS = (ConnectionError, TimeoutError)
+
+
+class TokenBucket:
+    """
+    Refills capacity units per minute, continuously, and never holds more than capacity.
+    """
+
+    def __init__(self, capacity_per_minute, now=None):
+        self.capacity = capacity_per_minute
+        self.available = capacity_per_minute
+        self.updated_at = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.capacity / 60)
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        # a request larger than the whole bucket only waits for a full bucket
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing * 60 / self.capacity)
+
+
+class SharedBuckets:
+    """
+    The request and token buckets of every process on the host, kept in a state file.
+
+    Each take locks the file, refills the buckets from the wall clock (monotonic
+    clocks are per process), draws from them if both have enough and writes them back.
+    """
+
+    def __init__(self, path, requests_per_minute, tokens_per_minute):
+        self.path = path
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+    def take(self, tokens):
+        """
+        Draws one request and tokens, returns 0 on success or the seconds to wait before trying again.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a+") as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)
+            state_file.seek(0)
+            try:
+                state = json.loads(state_file.read() or "{}")
+            except ValueError:
+                state = {}
+            now = time.time()
+            requests = self._bucket(self.requests_per_minute, state.get("requests"), now)
+            token_bucket = self._bucket(self.tokens_per_minute, state.get("tokens"), now)
+            wait = max(requests.wait_time(1), token_bucket.wait_time(tokens))
+            if wait == 0:
+                requests.available -= 1
+                token_bucket.available -= tokens
+            state_file.seek(0)
+            state_file.truncate()
+            json.dump({
+                "requests": [requests.available, requests.updated_at],
+                "tokens": [token_bucket.available, token_bucket.updated_at],
+            }, state_file)
+        return wait
+
+    def _bucket(self, capacity, stored, now):
+        bucket = TokenBucket(capacity, now=now)
+        if stored is not None:
+            bucket.available, bucket.updated_at = stored
+            # a lowered limit takes effect at once
+            bucket.available = min(bucket.available, capacity)
+        bucket.refill(now)
+        return bucket
+
+
+class RateLimiter:
+    """
+    Throttles every Cohere call of the process.
+
+    Two token buckets cap requests per minute and (estimated) tokens per minute.
+    With a state_path the buckets are SharedBuckets, so the API process and the
+    grading workers draw from one budget instead of one each. The number of
+    calls in flight is limited per process and follows AIMD: the limit grows by one per limit
+    successful calls and halves on every 429 or 5xx, which are retried after a
+    jittered exponential backoff.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_concurrency, max_retries, state_path=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.shared = SharedBuckets(state_path, requests_per_minute, tokens_per_minute) if state_path else None
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttle_events = 0
+        self.retries = 0
+        self._recent = deque()
+        self._condition = threading.Condition()
+
+    def call(self, fn, tokens=0):
+        """
+        Runs fn() once the buckets and the concurrency limit allow it, retrying on 429 and 5xx.
+
+        tokens is the estimated prompt size charged to the tokens-per-minute bucket.
+        """
+        attempt = 0
+        while True:
+            self._acquire(tokens)
+            try:
+                result = fn()
+            except Exception as error:
+                throttled = self._is_retryable(error)
+                self._release(throttled=throttled)
+                if not throttled or attempt >= self.max_retries:
+                    raise
+                # full jitter: anywhere between no wait and the exponential backoff
+                backoff = min(config.COHERE_BACKOFF_MAX, config.COHERE_BACKOFF_BASE * 2 ** attempt)
+                print(f"Cohere call throttled ({error}), retrying in up to {backoff:.1f}s")
+                with self._condition:
+                    self.retries += 1
+                time.sleep(random.uniform(0, backoff))
+                attempt += 1
+                continue
+            self._release(throttled=False)
+            return result
+
+    def metrics(self):
+        with self._condition:
+            now = time.monotonic()
+            self._trim(now)
+            return {
+                "requests_last_minute": len(self._recent),
+                "tokens_last_minute": sum(tokens for _, tokens in self._recent),
+                "requests_per_minute_limit": self.requests.capacity,
+                "tokens_per_minute_limit": self.tokens.capacity,
+                "concurrency_limit": int(self.concurrency_limit),
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "throttle_events": self.throttle_events,
+                "retries": self.retries,
+            }
+
+    def _acquire(self, tokens):
+        with self._condition:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    # the buckets are only drawn from once a concurrency slot is free
+                    wait = self._take_budget(tokens, now) if self.in_flight < int(self.concurrency_limit) else None
+                    if wait == 0:
+                        break
+                    # woken early when a call finishes, otherwise when the buckets have refilled
+                    self._condition.wait(timeout=wait)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            self._recent.append((now, tokens))
+            self._trim(now)
+
+    def _take_budget(self, tokens, now):
+        if self.shared is not None:
+            return self.shared.take(tokens)
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+        if wait == 0:
+            self.requests.available -= 1
+            self.tokens.available -= tokens
+        return wait
+
+    def _release(self, throttled):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttle_events += 1
+                self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            else:
+                self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+            self._condition.notify_all()
+
+    def _trim(self, now):
+        while self._recent and self._recent[0][0] < now - 60:
+            self._recent.popleft()
+
+    def _is_retryable(self, error):
+        if isinstance(error, RETRYABLE_ERRORS):
+            return True
+        # cohere errors carry http_status, httpx/requests errors a response
+        status = getattr(error, "http_status", None) or getattr(error, "status_code", None)
+        if status is None:
+            status = getattr(getattr(error, "response", None), "status_code", None)
+        return status is not None and (status == 429 or status >= 500)
+
+
+def estimate_tokens(*texts):
+    """
+    Whitespace token count of the texts, the estimate charged to the tokens-per-minute bucket.
+    """
+    return sum(len(text.split()) for text in texts)
+
+
+cohere_limiter = RateLimiter(
+    requests_per_minute=config.COHERE_REQUESTS_PER_MINUTE,
+    tokens_per_minute=config.COHERE_TOKENS_PER_MINUTE,
+    max_concurrency=config.COHERE_MAX_CONCURRENCY,
+    max_retries=config.COHERE_MAX_RETRIES,
+    state_path=config.COHERE_LIMITER_STATE_FILE,
+)
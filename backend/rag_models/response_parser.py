@@ -0,0 +1,123 @@
+import json
+import re
+
+FENCE_PATTERN = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+TRAILING_COMMA_PATTERN = re.compile(r",\s*([}\]])")
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def parse_json(text, expected_type=dict):
+    """
+    Extracts a JSON value of expected_type (dict or list) from an LLM reply.
+
+    The reply may wrap the JSON in a markdown fence or in prose. Each candidate
+    is parsed as is first, then again after repairing the defects models commonly
+    produce: smart quotes, single-quoted strings, Python literals, raw newlines
+    inside strings and trailing commas. Raises ValueError if nothing parses.
+    """
+    for candidate in _candidates(text, expected_type):
+        for attempt in (candidate, _repair(candidate)):
+            try:
+                value = json.loads(attempt)
+            except ValueError:
+                continue
+            if isinstance(value, expected_type):
+                return value
+    raise ValueError(f"No JSON {expected_type.__name__} found in response: {text[:200]!r}")
+
+
+def _candidates(text, expected_type):
+    opening = "{" if expected_type is dict else "["
+    sources = [match.group(1) for match in FENCE_PATTERN.finditer(text)] + [text]
+    for source in sources:
+        yield source.strip()
+        start = source.find(opening)
+        while start != -1:
+            end = _matching_bracket(source, start)
+            if end is not None:
+                yield source[start:end + 1]
+            # an unterminated value (e.g. a reply cut off by max_tokens) still gets its brackets closed
+            else:
+                yield _close_brackets(source[start:])
+            start = source.find(opening, start + 1)
+
+
+def _matching_bracket(text, start):
+    # index of the bracket closing text[start], skipping brackets inside strings
+    depth, in_string, quote, escaped = 0, False, None, False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                in_string = False
+        elif char in "\"'":
+            in_string, quote = True, char
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+def _close_brackets(text):
+    stack, in_string, escaped = [], False, False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    return text + ('"' if in_string else "") + "".join(reversed(stack))
+
+
+def _repair(text):
+    text = text.translate(SMART_QUOTES)
+    repaired, in_string, quote, escaped, i = [], False, None, False, 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+                # \' is valid in a single-quoted string but not in JSON
+                repaired.append(char if char == "'" else "\\" + char)
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                in_string = False
+                repaired.append('"')
+            elif char == '"':
+                # a double quote inside a single-quoted string
+                repaired.append('\\"')
+            elif char == "\n":
+                repaired.append("\\n")
+            elif char == "\t":
+                repaired.append("\\t")
+            else:
+                repaired.append(char)
+        elif char in "\"'":
+            in_string, quote = True, char
+            repaired.append('"')
+        else:
+            word = re.match(r"True|False|None", text[i:])
+            if word and not (i and text[i - 1].isalnum()):
+                repaired.append(PYTHON_LITERALS[word.group(0)])
+                i += len(word.group(0))
+                continue
+            repaired.append(char)
+        i += 1
+    return TRAILING_COMMA_PATTERN.sub(r"\1", "".join(repaired))
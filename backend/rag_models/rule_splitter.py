@@ -0,0 +1,93 @@
+import re
+
+# Numbering schemes in order of preference, "Q1:" and "Question 1" are less likely
+# than a bare "1." to also appear inside an answer (e.g. a numbered list of points)
+NUMBERING_SCHEMES = {
+    "question": re.compile(r"^[ \t]*(?:Q|Ques|Question)[ \t]*\.?[ \t]*(\d+)[ \t]*[:.)\-]?[ \t]*", re.IGNORECASE | re.MULTILINE),
+    "number": re.compile(r"^[ \t]*(\d+)[ \t]*[.):][ \t]*", re.MULTILINE),
+}
+ANSWER_MARKER = re.compile(r"^[ \t]*(?:Answer|Ans|A)[ \t]*\.?[ \t]*[:\-][ \t]*", re.IGNORECASE | re.MULTILINE)
+# Question papers often phrase questions as instructions, without a "?"
+INSTRUCTION = re.compile(
+    r"^(?:Define|State|Explain|Describe|List|Name|Write|Give|Discuss|Compare|Contrast|Calculate|Compute|"
+    r"Find|Derive|Prove|Show|Outline|Identify|Mention|Differentiate|Distinguish|Draw|Justify|Evaluate|"
+    r"Analy[sz]e|Summari[sz]e|Illustrate|Enumerate|Elaborate|Classify|Solve|Determine|Estimate)\b",
+    re.IGNORECASE,
+)
+
+
+class RuleBasedSplitter:
+    """
+    Splits regularly numbered question papers and answer scripts without an LLM.
+
+    Produces the same [{"no", "question", "answer"}] structure as QuestionSplitter
+    together with a confidence between 0 and 1 that the numbering was understood.
+    """
+
+    def split(self, text):
+        text = text or ""
+        best_chain, best_total = [], 0
+        for pattern in NUMBERING_SCHEMES.values():
+            matches = list(pattern.finditer(text))
+            chain = self._sequential_chain(matches)
+            if len(chain) > len(best_chain):
+                best_chain, best_total = chain, len(matches)
+
+        if not best_chain:
+            return [], 0.0
+
+        items = []
+        for i, match in enumerate(best_chain):
+            end = best_chain[i + 1].start() if i + 1 < len(best_chain) else len(text)
+            question, answer = self._split_body(text[match.end():end])
+            items.append({"no": int(match.group(1)), "question": question, "answer": answer})
+
+        return items, self._confidence(text, items, best_chain, best_total)
+
+    def _sequential_chain(self, matches):
+        # keep the markers numbered 1, 2, 3, ... in order. Markers indented deeper
+        # than the first one belong to a list inside an answer and are skipped.
+        # An unindented nested list can still lend its 2, 3, ... to the chain,
+        # but its 1 and the real questions it displaces are left out, which
+        # lowers the in-sequence share in _confidence
+        chain, expected, indent = [], 1, None
+        for match in matches:
+            if int(match.group(1)) != expected:
+                continue
+            match_indent = len(match.group(0)) - len(match.group(0).lstrip(" \t"))
+            if indent is not None and match_indent > indent:
+                continue
+            chain.append(match)
+            indent = match_indent if indent is None else indent
+            expected += 1
+        return chain
+
+    def _split_body(self, body):
+        marker = ANSWER_MARKER.search(body)
+        if marker:
+            return self._clean(body[:marker.start()]), self._clean(body[marker.end():])
+        question_end = body.find("?")
+        if question_end != -1:
+            return self._clean(body[:question_end + 1]), self._clean(body[question_end + 1:])
+        # answers only, the question is taken from the answer key when merging
+        return "", self._clean(body)
+
+    def _confidence(self, text, items, chain, total_markers):
+        in_sequence = len(chain) / total_markers
+        answered = sum(1 for item in items if item["answer"]) / len(items)
+        # answers only documents have no questions at all, but a question missing
+        # from some items means their question and answer were not told apart.
+        # Items that open with an instruction ("Define osmosis.") are questions
+        # without a "?" that ended up merged into the answer
+        questioned = sum(1 for item in items if item["question"]) / len(items)
+        if questioned == 0:
+            instructions = sum(1 for item in items if INSTRUCTION.match(item["answer"]))
+            questioned = 1.0 - instructions / len(items)
+        stripped = len(text.strip()) or 1
+        coverage = len(text[chain[0].start():].strip()) / stripped
+        confidence = min(in_sequence, answered, questioned, coverage)
+        # a single numbered block is as likely to be a heading as a question
+        return confidence if len(items) > 1 else confidence / 2
+
+    def _clean(self, text):
+        return re.sub(r"\s+", " ", text).strip()
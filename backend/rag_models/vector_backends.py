@@ -0,0 +1,262 @@
+import json
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+import numpy as np
+from langchain.callbacks.manager import CallbackManagerForRetrieverRun
+from langchain.docstore.document import Document
+from langchain.schema import BaseRetriever
+from langchain.vectorstores import Weaviate
+
+from backend.config.config import config
+from backend.utils.errors import InternalServerError
+
+
+class VectorStoreBackend(ABC):
+    """
+    Where the chunks of a reference context are stored and searched, one collection per context_key.
+    """
+
+    @abstractmethod
+    def create_collection(self, class_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def add_chunks(self, class_name: str, docs: List[Document], vectors: List[List[float]]) -> None:
+        ...
+
+    @abstractmethod
+    def delete_collection(self, class_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def as_retriever(self, class_name: str, embeddings, k: int) -> BaseRetriever:
+        ...
+
+
+class WeaviateBackend(VectorStoreBackend):
+    """
+    Stores contexts as classes in the remote Weaviate instance.
+    """
+
+    # the client is shared by the whole process, see ClientRegistry, and so is its
+    # batch with the callback configured on it, so one ingestion batches at a time
+    _batch_lock = threading.Lock()
+
+    def __init__(self, client):
+        self.client = client
+
+    def create_collection(self, class_name):
+        # lets make sure its vectorizer is what the one we want
+        class_definition = {
+            "class": class_name, #should be obtainable from the doc_path
+            "vectorizer": "text2vec-cohere",
+            "vectorIndexConfig": {
+                "distance": "cosine" # Set to "cosine" for English models; "dot" for multilingual models
+            },
+            "moduleConfig": { # specify the model you want to use
+                    "generative-cohere": {
+                        "model": "command-xlarge-nightly",  #// Optional - Defaults to `command-xlarge-nightly`.
+                        # Can also use`command-xlarge-beta` and `command-xlarge`
+                        "temperatureProperty": 1.1,  #// Optional
+                        #"maxTokensProperty": <maxTokens>,  // Optional
+                        #"kProperty": <k>, // Optional
+                        #"stopSequencesProperty": <stopSequences>, // Optional
+                        #"returnLikelihoodsProperty": <returnLikelihoods>, // Optional
+                    },
+                    "text2vec-cohere": {
+                        "model": "embed-multilingual-v3.0", # Defaults to embed-multilingual-v3.0 if not set
+                        # "truncate": "RIGHT", # Defaults to RIGHT if not set
+                        #"baseURL": "https://proxy.yourcompanydomain.com"  // Optional.
+                        # Can be overridden by one set in the HTTP header.
+                }
+            }
+        }
+
+        self.client.schema.create_class(class_definition)
+
+    def add_chunks(self, class_name, docs, vectors):
+        # the batch only reports rejected objects to its callback, it does not raise
+        errors = []
+
+        def collect_errors(results):
+            for result in results or []:
+                object_errors = result.get("result", {}).get("errors")
+                if object_errors:
+                    errors.append(object_errors)
+
+        with self._batch_lock:
+            self.client.batch.configure(batch_size=config.WEAVIATE_BATCH_SIZE, num_workers=config.EMBED_CONCURRENCY, callback=collect_errors)
+            with self.client.batch as batch:
+                for doc, vector in zip(docs, vectors):
+                    batch.add_data_object(
+                        data_object={"text": doc.page_content, **doc.metadata},
+                        class_name=class_name,
+                        vector=vector,
+                    )
+        if errors:
+            raise InternalServerError(f"Weaviate rejected {len(errors)} of {len(docs)} chunks of {class_name}: {errors[0]}")
+
+    def delete_collection(self, class_name):
+        self.client.schema.delete_class(class_name)
+
+    def as_retriever(self, class_name, embeddings, k):
+        # the query is vectorized by Weaviate's text2vec-cohere module, embeddings are not needed
+        return Weaviate(self.client, class_name, "text").as_retriever(search_kwargs={"k": k})
+
+
+class LocalBackend(VectorStoreBackend):
+    """
+    Stores every context on local disk under LOCAL_VECTOR_DIR/<context_key>.
+
+    vectors.npy holds the L2-normalized chunk vectors and chunks.json their text
+    and metadata. Small contexts are searched by brute-force cosine similarity
+    over the whole matrix. Contexts with at least LOCAL_IVF_MIN_VECTORS chunks
+    also get an IVF index (k-means centroids plus the rows of each cluster) and
+    only the LOCAL_IVF_NPROBE closest clusters are scanned.
+
+    Loaded collections are kept in memory and reloaded when another process
+    has rewritten their files since.
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or config.LOCAL_VECTOR_DIR
+        self._loaded: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def create_collection(self, class_name):
+        os.makedirs(self._path(class_name), exist_ok=True)
+
+    def add_chunks(self, class_name, docs, vectors):
+        path = self._path(class_name)
+        os.makedirs(path, exist_ok=True)
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32))
+        chunks = [{"text": doc.page_content, "metadata": doc.metadata} for doc in docs]
+
+        if os.path.exists(os.path.join(path, "vectors.npy")):
+            matrix = np.concatenate([np.load(os.path.join(path, "vectors.npy")), matrix])
+            with open(os.path.join(path, "chunks.json")) as chunks_file:
+                chunks = json.load(chunks_file) + chunks
+
+        # every file is replaced whole and chunks.json goes last, its mtime is the version _load checks
+        self._save_array(path, "vectors.npy", matrix)
+        if len(matrix) >= config.LOCAL_IVF_MIN_VECTORS:
+            centroids, assignments = self._build_ivf(matrix)
+            self._save_array(path, "centroids.npy", centroids)
+            self._save_array(path, "assignments.npy", assignments)
+        with open(os.path.join(path, "chunks.json.tmp"), "w") as chunks_file:
+            json.dump(chunks, chunks_file)
+        os.replace(os.path.join(path, "chunks.json.tmp"), os.path.join(path, "chunks.json"))
+
+        with self._lock:
+            self._loaded.pop(class_name, None)
+
+    def delete_collection(self, class_name):
+        shutil.rmtree(self._path(class_name), ignore_errors=True)
+        with self._lock:
+            self._loaded.pop(class_name, None)
+
+    def as_retriever(self, class_name, embeddings, k):
+        return LocalRetriever(backend=self, class_name=class_name, embeddings=embeddings, k=k)
+
+    def search(self, class_name: str, query_vector: List[float], k: int) -> List[Document]:
+        index = self._load(class_name)
+        query = self._normalize(np.asarray([query_vector], dtype=np.float32))[0]
+
+        candidates = None
+        if "centroids" in index:
+            nprobe = min(config.LOCAL_IVF_NPROBE, len(index["centroids"]))
+            closest_clusters = np.argsort(index["centroids"] @ query)[::-1][:nprobe]
+            candidates = np.flatnonzero(np.isin(index["assignments"], closest_clusters))
+
+        vectors = index["vectors"] if candidates is None else index["vectors"][candidates]
+        scores = vectors @ query
+        top = np.argsort(scores)[::-1][:k]
+        rows = top if candidates is None else candidates[top]
+        return [
+            Document(page_content=index["chunks"][row]["text"], metadata=index["chunks"][row]["metadata"])
+            for row in rows
+        ]
+
+    def _load(self, class_name, attempts: int = 3):
+        # the cached index is only trusted while chunks.json is the one it was loaded from,
+        # another process may have added chunks to the collection since
+        path = self._path(class_name)
+        with self._lock:
+            for _ in range(attempts):
+                version = os.stat(os.path.join(path, "chunks.json")).st_mtime_ns
+                cached = self._loaded.get(class_name)
+                if cached is not None and cached["version"] == version:
+                    return cached
+                index = {"version": version, "vectors": np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")}
+                with open(os.path.join(path, "chunks.json")) as chunks_file:
+                    index["chunks"] = json.load(chunks_file)
+                if os.path.exists(os.path.join(path, "centroids.npy")):
+                    index["centroids"] = np.load(os.path.join(path, "centroids.npy"))
+                    index["assignments"] = np.load(os.path.join(path, "assignments.npy"))
+                # files read while a writer was replacing them do not line up, read them again
+                rows = len(index["chunks"])
+                if len(index["vectors"]) == rows and len(index.get("assignments", index["vectors"])) == rows:
+                    self._loaded[class_name] = index
+                    return index
+            raise InternalServerError(f"Local vector collection {class_name} kept changing while it was loaded")
+
+    def _save_array(self, path, name, array):
+        # np.save appends .npy to names without it, so the temporary name keeps the suffix
+        temp_path = os.path.join(path, f"tmp-{name}")
+        np.save(temp_path, array)
+        os.replace(temp_path, os.path.join(path, name))
+
+    def _build_ivf(self, matrix, iterations: int = 10):
+        # spherical k-means: vectors and centroids are unit length, so the dot product is the cosine
+        no_of_clusters = max(1, int(np.sqrt(len(matrix))))
+        rng = np.random.default_rng(0)
+        centroids = matrix[rng.choice(len(matrix), no_of_clusters, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(matrix @ centroids.T, axis=1)
+            for cluster in range(no_of_clusters):
+                members = matrix[assignments == cluster]
+                if len(members):
+                    centroids[cluster] = members.mean(axis=0)
+            centroids = self._normalize(centroids)
+        return centroids, np.argmax(matrix @ centroids.T, axis=1)
+
+    def _normalize(self, matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def _path(self, class_name):
+        return os.path.join(self.directory, class_name)
+
+
+class LocalRetriever(BaseRetriever):
+    """
+    langchain retriever over a LocalBackend collection, usable by RetrievalQA.
+    """
+
+    backend: Any
+    class_name: str
+    embeddings: Any
+    k: int = 10
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.backend.search(self.class_name, self.embeddings.embed_query(query), self.k)
+
+
+def get_vector_backend(weaviate_client=None) -> VectorStoreBackend:
+    """
+    Returns the backend selected by VECTOR_BACKEND ("weaviate" or "local").
+    """
+    if config.VECTOR_BACKEND == "local":
+        return _local_backend
+    return WeaviateBackend(weaviate_client)
+
+
+# shared so every grader in the process reuses the collections already loaded into memory
+_local_backend = LocalBackend()
@@ -1,5 +1,7 @@
 import os
+import time
 import weaviate
+from concurrent.futures import ThreadPoolExecutor
 from langchain.llms import Cohere
 from langchain.embeddings import CohereEmbeddings
 import getpass
@@ -10,56 +12,25 @@ from langchain.document_loaders import PyPDFLoader, PyPDFDirectoryLoader
 from langchain.document_loaders import TextLoader
 from langchain.retrievers.document_compressors import CohereRerank
 from backend.config.config import config
+from backend.rag_models.chunker import MultiGranularityChunker
+from backend.rag_models.embedding_cache import EmbeddingCache
+from backend.rag_models.vector_backends import get_vector_backend
+from backend.rag_models.clients import clients, EMBED_MODEL
+from backend.rag_models.rate_limiter import cohere_limiter, estimate_tokens
 
 class VectorDB:
     def __init__(self):
-        cohere_api_key = config.COHERE_API_KEY
-        weaviate_api_key = config.WEAVIATE_API_KEY
-        weaviate_url = config.WEAVIATE_URL
+        # the clients are shared by the whole process, see ClientRegistry
+        self.client = clients.get_weaviate_client() if config.VECTOR_BACKEND == "weaviate" else None
+        self.backend = get_vector_backend(self.client)
 
-        self.client=weaviate.Client(
-            url=weaviate_url,  # URL of your Weaviate instance
-            auth_client_secret=weaviate.AuthApiKey(api_key=weaviate_api_key),  # Replace w/ your Weaviate instance API key
-
-            additional_headers={
-                "X-Cohere-Api-Key": cohere_api_key, # Replace with your OpenAI key
-            }
-        )
-                
-        self.client.schema.delete_class("WikipediaLangChain")
-        # Initialize the Cohere client in the constructor
-
-        self.embeddings = CohereEmbeddings(model = "embed-multilingual-v3.0",cohere_api_key=cohere_api_key)
+        self.last_ingest_stats = None
+        self.embeddings = clients.get_embeddings()
+        self.embedding_cache = EmbeddingCache(EMBED_MODEL)
 
     def embed_and_store(self, document, class_name):
         print(document, class_name)
-        # lets make sure its vectorizer is what the one we want
-        class_definition = {
-            "class": class_name, #should be obtainable from the doc_path
-            "vectorizer": "text2vec-cohere",
-            "vectorIndexConfig": {
-                "distance": "cosine" # Set to "cosine" for English models; "dot" for multilingual models
-            },
-            "moduleConfig": { # specify the model you want to use
-                    "generative-cohere": { 
-                        "model": "command-xlarge-nightly",  #// Optional - Defaults to `command-xlarge-nightly`. 
-                        # Can also use`command-xlarge-beta` and `command-xlarge`
-                        "temperatureProperty": 1.1,  #// Optional
-                        #"maxTokensProperty": <maxTokens>,  // Optional
-                        #"kProperty": <k>, // Optional
-                        #"stopSequencesProperty": <stopSequences>, // Optional
-                        #"returnLikelihoodsProperty": <returnLikelihoods>, // Optional
-                    },
-                    "text2vec-cohere": {
-                        "model": "embed-multilingual-v3.0", # Defaults to embed-multilingual-v3.0 if not set
-                        # "truncate": "RIGHT", # Defaults to RIGHT if not set
-                        #"baseURL": "https://proxy.yourcompanydomain.com"  // Optional. 
-                        # Can be overridden by one set in the HTTP header.
-                }
-            }
-        }
-
-        self.client.schema.create_class(class_definition)
+        self.backend.create_collection(class_name)
 
         metadata = [dict(year=2016, source=class_name)]
 
@@ -71,43 +42,63 @@ class VectorDB:
 
         documents += document
 
-        text_splitter = CharacterTextSplitter(
-            chunk_size = 1024,
-            chunk_overlap = 0,
-        )
-        docs = text_splitter.split_documents(documents)
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size = 1024,
-            chunk_overlap = 200,
-        )
-        docs1 = text_splitter.split_documents(documents)
-
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size = 512,
-            chunk_overlap = 100,
-        )
-        docs2 = text_splitter.split_documents(documents)
+        # every configured granularity comes out of one tokenization pass, and chunks
+        # repeated across granularities are stored once
+        docs = MultiGranularityChunker(config.VECTOR_CHUNK_CONFIGS).split_documents(documents)
+        print(f"Chunked {class_name} into {len(docs)} chunks for sizes {config.VECTOR_CHUNK_CONFIGS}")
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size = 256,
-            chunk_overlap = 50,
-        )
-        docs3 = text_splitter.split_documents(documents)
+        try:    
+            started = time.perf_counter()
+            vectors = self._embed_chunks([doc.page_content for doc in docs])
+            self.backend.add_chunks(class_name, docs, vectors)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            # a partly imported collection would be searched as if it were complete
+            self.delete_collection(class_name)
+            return False
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size = 128,
-            chunk_overlap = 25,
-        )
-        docs4 = text_splitter.split_documents(documents)
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        # whitespace separated words, not model tokens
+        no_of_words = sum(len(doc.page_content.split()) for doc in docs)
+        self.last_ingest_stats = {
+            "chunks": len(docs),
+            "words": no_of_words,
+            "seconds": elapsed,
+            "chunks_per_second": len(docs) / elapsed,
+            "words_per_second": no_of_words / elapsed,
+            "embedding_cache_hit_rate": self.embedding_cache.hit_rate,
+        }
+        print(f"Ingested {class_name}: {len(docs)} chunks in {elapsed:.2f}s "
+              f"({len(docs) / elapsed:.1f} chunks/s, {no_of_words / elapsed:.1f} words/s)")
+        return True
 
-        try:    
-            Weaviate.from_documents(docs, self.embeddings, index_name=class_name, client=self.client, by_text=False)
-            Weaviate.from_documents(docs1, self.embeddings, index_name=class_name, client=self.client, by_text=False)
-            Weaviate.from_documents(docs2, self.embeddings, index_name=class_name, client=self.client, by_text=False)
-            Weaviate.from_documents(docs3, self.embeddings, index_name=class_name, client=self.client, by_text=False)
-            Weaviate.from_documents(docs4, self.embeddings, index_name=class_name, client=self.client, by_text=False)
+    def delete_collection(self, class_name):
+        try:
+            self.backend.delete_collection(class_name)
         except Exception as e:
             print(f"An error occurred: {e}")
             return False
-        return True
\ No newline at end of file
+        return True
+
+    def _embed_batch(self, batch):
+        return cohere_limiter.call(lambda: self.embeddings.embed_documents(batch), tokens=estimate_tokens(*batch))
+
+    def _embed_chunks(self, texts):
+        # chunks seen before (the same chapter uploaded as another reference) reuse their stored vectors
+        vectors = self.embedding_cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        missing_texts = [texts[i] for i in missing]
+
+        # a few batches are embedded concurrently, executor.map keeps the vectors in chunk order
+        batch_size = max(1, config.EMBED_BATCH_SIZE)
+        batches = [missing_texts[i:i + batch_size] for i in range(0, len(missing_texts), batch_size)]
+        with ThreadPoolExecutor(max_workers=max(1, config.EMBED_CONCURRENCY)) as executor:
+            embedded_batches = list(executor.map(self._embed_batch, batches))
+        embedded = [vector for batch in embedded_batches for vector in batch]
+
+        self.embedding_cache.put_many(missing_texts, embedded)
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+        print(f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} chunks reused, "
+              f"hit rate {self.embedding_cache.hit_rate:.1%}")
+        return vectors
@@ -1,39 +1,31 @@
 from fastapi import APIRouter, status, Query, Form, File, UploadFile
 from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 
-from backend.schemas.answer_schema import CreateAnswer
+from backend.config.config import config
+from backend.schemas.answer_schema import CreateAnswer, CreateAnswerBatch
 from backend.core.answer_core import AnswerCore
+from backend.core.grading_job_core import GradingJobCore
 from backend.utils.errors import NotFoundError
+from backend.routes.unit_of_work_route import UnitOfWorkRoute
+from backend.routes.pagination import paginated_response
+from backend.utils.pdf_extractor import extract_text
+from backend.utils.upload_spool import spool_upload, spool_stream
 from pydantic import ValidationError
 
-import pdfplumber
-import tempfile
-import io
+from contextlib import ExitStack
+import zipfile
+import os
 import json
 
-answer_router = APIRouter()
+answer_router = APIRouter(route_class=UnitOfWorkRoute)
 
 @answer_router.post("/")
 async def create_answer(file: UploadFile = File(...), answer_data: str = Form(...)):
-    try:
-        if not file.filename.endswith(".pdf"):
-            return JSONResponse(content='{"message": "Only PDF files are allowed."}', status_code=status.HTTP_400_BAD_REQUEST)
-        filename = file.filename
-        # Read the uploaded PDF file as bytes
-        pdf_data = await file.read()
-
-        # Process the PDF data in memory
-        # For example, you can use a library like pdfplumber to extract text
-        # Here's a simple example using pdfplumber:
-
-        with pdfplumber.open(io.BytesIO(pdf_data)) as pdf:
-            answer_pdf = ""
-            for page in pdf.pages:
-                answer_pdf += page.extract_text()
-    
-    except Exception as error:
-        print(error)
-        return JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    if not file.filename.endswith(".pdf"):
+        return JSONResponse(content='{"message": "Only PDF files are allowed."}', status_code=status.HTTP_400_BAD_REQUEST)
+    filename = file.filename
     
     # Parse the JSON data
     try:
@@ -49,15 +41,90 @@ async def create_answer(file: UploadFile = File(...), answer_data: str = Form(..
         print(e)
         return JSONResponse(content='{"message": "Invalid JSON data!!"}', status_code=status.HTTP_400_BAD_REQUEST)
                 
-    answer_core = AnswerCore()
+    grading_job_core = GradingJobCore()
     try:
-        answer = answer_core.create_answer(validated_answer_data, answer_pdf, filename=filename)
-        return JSONResponse(content=answer, status_code=status.HTTP_200_OK)
+        # Stream the upload to a spool, text extraction and grading happen in a grading worker
+        with await spool_upload(file) as spooled_pdf:
+            job = grading_job_core.submit_job(validated_answer_data, spooled_pdf.file, filename=filename)
+        return JSONResponse(content=job, status_code=status.HTTP_202_ACCEPTED)
     except Exception as error:
         print(error)
         return JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
 
+# Grade the answer scripts of a whole class for one exam
+@answer_router.post("/batch")
+async def create_answers_batch(files: List[UploadFile] = File(...), batch_data: str = Form(...)):
+    # Parse and validate the JSON data, it maps every PDF file name to a student id
+    try:
+        validated_batch_data = CreateAnswerBatch(**json.loads(batch_data))
+    except (json.JSONDecodeError, ValidationError) as e:
+        print(e)
+        return JSONResponse(content='{"message": "Invalid JSON data!!"}', status_code=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        with ExitStack() as spools:
+            pdf_files = []
+            for file in files:
+                if file.filename.endswith(".zip"):
+                    spooled_zip = spools.enter_context(await spool_upload(file))
+                    with zipfile.ZipFile(spooled_zip.file) as archive:
+                        for member in archive.namelist():
+                            if member.endswith(".pdf"):
+                                with archive.open(member) as member_file:
+                                    pdf_files.append(spools.enter_context(spool_stream(os.path.basename(member), member_file)))
+                elif file.filename.endswith(".pdf"):
+                    pdf_files.append(spools.enter_context(await spool_upload(file)))
+                else:
+                    return JSONResponse(content='{"message": "Only PDF or ZIP files are allowed."}', status_code=status.HTTP_400_BAD_REQUEST)
+
+            scripts = []
+            for spooled_pdf in pdf_files:
+                if spooled_pdf.name not in validated_batch_data.students:
+                    return JSONResponse(content=json.dumps({"message": f"No student mapped to {spooled_pdf.name}"}), status_code=status.HTTP_400_BAD_REQUEST)
+                answer_pdf = await run_in_threadpool(extract_text, spooled_pdf.source, spooled_pdf.name)
+                scripts.append({"student_id": validated_batch_data.students[spooled_pdf.name], "filename": spooled_pdf.name, "answer_pdf": answer_pdf})
+
+    except Exception as error:
+        print(error)
+        return JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    answer_core = AnswerCore()
+    try:
+        # grading a class takes a while, keep it off the event loop
+        answers = await run_in_threadpool(answer_core.create_answers_batch, validated_batch_data.exam_id, scripts)
+        return JSONResponse(content=answers, status_code=status.HTTP_200_OK)
+    except Exception as error:
+        print(error)
+        return JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Retrieve the grading jobs of an exam
+@answer_router.get("/jobs/")
+def get_grading_jobs_by_exam_id(exam_id: int = Query(..., description="Exam Id")):
+    grading_job_core = GradingJobCore()
+    try:
+        jobs = grading_job_core.get_jobs_by_exam_id(exam_id)
+        response = JSONResponse(content=jobs, status_code=status.HTTP_200_OK)
+    except Exception as error:
+        print(error)
+        response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return response
+
+# Retrieve the status of a grading job
+@answer_router.get("/jobs/{job_id}")
+def get_grading_job(job_id: int):
+    grading_job_core = GradingJobCore()
+    try:
+        job = grading_job_core.get_job_by_id(job_id)
+        response = JSONResponse(content=job, status_code=status.HTTP_200_OK)
+    except NotFoundError as error:
+        print(error)
+        response = JSONResponse(content='{"message": "Grading Job doesnot exist!!"}', status_code=status.HTTP_404_NOT_FOUND) 
+    except Exception as error:
+        print(error)
+        response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return response
+
 # Retrieve a user by ID
 @answer_router.get("/{answer_id}")
 def get_answer(answer_id: int):
@@ -75,11 +142,11 @@ def get_answer(answer_id: int):
     return response
 
 @answer_router.get("/")
-def get_answers_by_exam_id(exam_id: str = Query(..., description="Exam Id")):
+def get_answers_by_exam_id(exam_id: str = Query(..., description="Exam Id"), limit: int = Query(config.LIST_PAGE_SIZE, ge=1, le=config.LIST_MAX_PAGE_SIZE, description="Page size"), after_id: Optional[int] = Query(None, description="Cursor: id of the last item of the previous page")):
     answer_core = AnswerCore()
     try:
-        answers = answer_core.get_answers_by_exam_id(exam_id)
-        response = JSONResponse(content=answers, status_code=status.HTTP_200_OK)
+        answers = answer_core.get_answers_by_exam_id(exam_id, after_id=after_id, limit=limit + 1)
+        response = paginated_response(answers, limit)
     except Exception as error:
         print(error)
         response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
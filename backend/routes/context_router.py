@@ -1,17 +1,20 @@
 from fastapi import APIRouter, status, Query, Form, File, UploadFile
 from fastapi.responses import JSONResponse, Response
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 
+from backend.config.config import config
 from backend.schemas.context_schema import CreateContext
 from backend.core.context_core import ContextCore
 from backend.utils.errors import NotFoundError
+from backend.routes.unit_of_work_route import UnitOfWorkRoute
+from backend.routes.pagination import paginated_response
+from backend.utils.pdf_extractor import extract_documents
+from backend.utils.upload_spool import spool_upload
 from pydantic import ValidationError
-from langchain.document_loaders import PyPDFLoader
-
-import io
 import json
-import tempfile
 
-context_router = APIRouter()
+context_router = APIRouter(route_class=UnitOfWorkRoute)
 
 @context_router.post("/")
 async def create_context(file: UploadFile = File(...), context: str = Form(...)):
@@ -19,20 +22,9 @@ async def create_context(file: UploadFile = File(...), context: str = Form(...))
         if not file.filename.endswith(".pdf"):
             return JSONResponse(content='{"message": "Only PDF files are allowed."}', status_code=status.HTTP_400_BAD_REQUEST)
         filename = str(file.filename)
-        context_pdf = None
-        with tempfile.NamedTemporaryFile(delete=True) as temp_file:
-            # Read the content from the uploaded file
-            contents = await file.read()
-
-            # Write the content to the temporary file
-            temp_file.write(contents)
-            temp_file.flush()
-
-            # Get the path of the temporary file
-            temp_file_path = temp_file.name
-            
-            loader = PyPDFLoader(temp_file_path)
-            context_pdf = loader.load()
+        # Stream the upload to a spool, large reference books end up on disk instead of in memory
+        with await spool_upload(file) as spooled_pdf:
+            context_pdf = await run_in_threadpool(extract_documents, spooled_pdf.source, filename)
         
     except Exception as error:
         print(error)
@@ -54,7 +46,8 @@ async def create_context(file: UploadFile = File(...), context: str = Form(...))
                 
     context_core = ContextCore()
     try:
-        context = context_core.create_context(input=validated_context_data, context_pdf=context_pdf, filename=filename)
+        # embedding a large reference takes a while, keep it off the event loop
+        context = await run_in_threadpool(context_core.create_context, input=validated_context_data, context_pdf=context_pdf, filename=filename)
         return JSONResponse(content=context, status_code=status.HTTP_200_OK)
     except Exception as error:
         print(error)
@@ -78,11 +71,11 @@ def get_context(context_id: int):
     return response
 
 @context_router.get("/")
-def get_contexts_by_exam_id(user_id: str = Query(..., description="Exam Id")):
+def get_contexts_by_exam_id(user_id: str = Query(..., description="Exam Id"), limit: int = Query(config.LIST_PAGE_SIZE, ge=1, le=config.LIST_MAX_PAGE_SIZE, description="Page size"), after_id: Optional[int] = Query(None, description="Cursor: id of the last item of the previous page")):
     context_core = ContextCore()
     try:
-        contexts = context_core.get_contexts_by_user_id(user_id)
-        response = JSONResponse(content=contexts, status_code=status.HTTP_200_OK)
+        contexts = context_core.get_contexts_by_user_id(user_id, after_id=after_id, limit=limit + 1)
+        response = paginated_response(contexts, limit)
     except Exception as error:
         print(error)
         response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1,18 +1,22 @@
 from fastapi import APIRouter, status, Query, Form, File, UploadFile
 from fastapi.responses import JSONResponse, Response
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 
+from backend.config.config import config
 from backend.schemas.exam_schema import CreateExam
 from backend.core.exam_core import ExamCore
 from backend.utils.errors import NotFoundError
+from backend.routes.unit_of_work_route import UnitOfWorkRoute
+from backend.routes.pagination import paginated_response
+from backend.utils.pdf_extractor import extract_text
+from backend.utils.upload_spool import spool_upload
 
 from pydantic import ValidationError
 
-import pdfplumber
-import tempfile
-import io
 import json
 
-exam_router = APIRouter()
+exam_router = APIRouter(route_class=UnitOfWorkRoute)
 
 @exam_router.post("/")
 async def create_new_exam(file: UploadFile = File(...), exam: str = Form(...)):
@@ -21,17 +25,9 @@ async def create_new_exam(file: UploadFile = File(...), exam: str = Form(...)):
         if not file.filename.endswith(".pdf"):
             return JSONResponse(content='{"message": "Only PDF files are allowed."}', status_code=status.HTTP_400_BAD_REQUEST)
         filename = str(file.filename)
-        # Read the uploaded PDF file as bytes
-        pdf_data = await file.read()
-
-        # Process the PDF data in memory
-        # For example, you can use a library like pdfplumber to extract text
-        # Here's a simple example using pdfplumber:
-
-        with pdfplumber.open(io.BytesIO(pdf_data)) as pdf:
-            pdf_text = ""
-            for page in pdf.pages:
-                pdf_text += page.extract_text()
+        # Stream the upload to a spool instead of holding the whole PDF in memory
+        with await spool_upload(file) as spooled_pdf:
+            pdf_text = await run_in_threadpool(extract_text, spooled_pdf.source, filename)
 
     except Exception as error:
         print(error)
@@ -77,12 +73,36 @@ def get_exam(exam_id: int):
         response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
     return response
 
+# Retrieve the grade cache hits and misses of an exam
+@exam_router.get("/{exam_id}/grade-cache")
+def get_exam_grade_cache_stats(exam_id: int):
+    exam_core = ExamCore()
+    try:
+        stats = exam_core.get_grade_cache_stats(exam_id)
+        response = JSONResponse(content=stats, status_code=status.HTTP_200_OK)
+    except Exception as error:
+        print(error)
+        response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return response
+
+# Retrieve the tokens, latency and regrades of the batched grading prompts of an exam
+@exam_router.get("/{exam_id}/grading-batches")
+def get_exam_grading_batch_stats(exam_id: int):
+    exam_core = ExamCore()
+    try:
+        stats = exam_core.get_grading_batch_stats(exam_id)
+        response = JSONResponse(content=stats, status_code=status.HTTP_200_OK)
+    except Exception as error:
+        print(error)
+        response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return response
+
 @exam_router.get("/")
-def get_exams_by_user_id(user_id: str = Query(..., description="User Id")):
+def get_exams_by_user_id(user_id: str = Query(..., description="User Id"), limit: int = Query(config.LIST_PAGE_SIZE, ge=1, le=config.LIST_MAX_PAGE_SIZE, description="Page size"), after_id: Optional[int] = Query(None, description="Cursor: id of the last item of the previous page")):
     exam_core = ExamCore()
     try:
-        exams = exam_core.get_exams_by_user_id(user_id)
-        response = JSONResponse(content=exams, status_code=status.HTTP_200_OK)
+        exams = exam_core.get_exams_by_user_id(user_id, after_id=after_id, limit=limit + 1)
+        response = paginated_response(exams, limit)
     except Exception as error:
         print(error)
         response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from backend.rag_models.rate_limiter import cohere_limiter
+from backend.utils.db_conn import conn
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/cohere")
+def get_cohere_metrics():
+    try:
+        response = JSONResponse(content=cohere_limiter.metrics(), status_code=status.HTTP_200_OK)
+    except Exception as error:
+        print(error)
+        response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return response
+
+
+@metrics_router.get("/db")
+def get_db_metrics():
+    try:
+        response = JSONResponse(content=conn.pool_metrics(), status_code=status.HTTP_200_OK)
+    except Exception as error:
+        print(error)
+        response = JSONResponse(content='{"message": "Some Exception has occurred!!"}', status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return response
@@ -0,0 +1,18 @@
+from typing import Dict, List
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+# Response header carrying the cursor of the next page, absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def paginated_response(items: List[Dict], limit: int) -> JSONResponse:
+    """
+    Builds the response of a list endpoint from up to limit + 1 items.
+
+    The extra item only tells whether there is a next page, it is not returned.
+    """
+    page = items[:limit]
+    headers = {NEXT_CURSOR_HEADER: str(page[-1]["id"])} if len(items) > limit else {}
+    return JSONResponse(content=page, status_code=status.HTTP_200_OK, headers=headers)
@@ -1,11 +1,15 @@
 from fastapi import APIRouter, status, Query, Form
 from fastapi.responses import JSONResponse, Response
+from typing import Optional
 
+from backend.config.config import config
 from backend.schemas.student_schema import CreateStudent
 from backend.core.student_core import StudentCore
 from backend.utils.errors import NotFoundError
+from backend.routes.unit_of_work_route import UnitOfWorkRoute
+from backend.routes.pagination import paginated_response
 
-student_router = APIRouter()
+student_router = APIRouter(route_class=UnitOfWorkRoute)
 
 @student_router.post("/")
 def create_student(input: CreateStudent):
@@ -34,11 +38,11 @@ def get_student(student_id: int):
     return response
 
 @student_router.get("/")
-def get_students_by_user_id(user_id: str = Query(..., description="User Id")):
+def get_students_by_user_id(user_id: str = Query(..., description="User Id"), limit: int = Query(config.LIST_PAGE_SIZE, ge=1, le=config.LIST_MAX_PAGE_SIZE, description="Page size"), after_id: Optional[int] = Query(None, description="Cursor: id of the last item of the previous page")):
     student_core = StudentCore()
     try:
-        students = student_core.get_students_by_user_id(user_id)
-        response = JSONResponse(content=students, status_code=status.HTTP_200_OK)
+        students = student_core.get_students_by_user_id(user_id, after_id=after_id, limit=limit + 1)
+        response = paginated_response(students, limit)
     except NotFoundError as error:
         print(error)
         response = JSONResponse(content='{"message": "Student doesnot exist!!"}', status_code=status.HTTP_404_NOT_FOUND) 
@@ -0,0 +1,36 @@
+import asyncio
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+from backend.utils.db_conn import conn
+
+
+class UnitOfWorkRoute(APIRoute):
+    """
+    Route class that serves every request as one unit of work.
+
+    The session is bound in the request's own context, which FastAPI copies into
+    the threadpool that runs sync endpoints. It is committed before the response
+    is returned, so a failed commit becomes a 500 instead of following a success
+    response that was already sent. Error responses roll back. The blocking
+    commit and close run in a worker thread, not on the event loop.
+    """
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def unit_of_work_handler(request: Request) -> Response:
+            session, token = conn.open_scope()
+            try:
+                response = await route_handler(request)
+            except BaseException:
+                conn.unbind_scope(token)
+                await asyncio.to_thread(conn.end_scope, session, True)
+                raise
+            conn.unbind_scope(token)
+            await asyncio.to_thread(conn.end_scope, session, response.status_code >= 400)
+            return response
+
+        return unit_of_work_handler
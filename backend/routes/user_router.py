@@ -5,9 +5,10 @@ from fastapi.responses import JSONResponse, Response
 from backend.schemas.user_schema import CreateUser, UpdateUser
 from backend.core.user_core import UserCore
 from backend.utils.errors import NotFoundError
+from backend.routes.unit_of_work_route import UnitOfWorkRoute
 
 
-user_router = APIRouter()
+user_router = APIRouter(route_class=UnitOfWorkRoute)
 
 # Create a new user
 @user_router.post("/")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict
 from datetime import date
 
 class CreateAnswer(BaseModel):
@@ -9,6 +9,13 @@ class CreateAnswer(BaseModel):
     class Config:
         from_attributes = True 
 
+class CreateAnswerBatch(BaseModel):
+    exam_id: int
+    students: Dict[str, int]
+
+    class Config:
+        from_attributes = True
+
 class AnswerResponse(BaseModel):
     id: int
     student_name: str
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict
+
+class GradingJobResponse(BaseModel):
+    id: int
+    student_id: int
+    exam_id: int
+    file_name: str
+    status: str
+    total_questions: int
+    completed_questions: int
+    progress: List[Dict]
+    answer_id: Optional[int]
+    error: Optional[str]
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,98 @@
+"""
+Compares the write throughput of AnswerDao.create_answer across database options.
+
+    python -m backend.utils.db_benchmark --answers 500 --threads 8
+
+Each sqlite option runs against a fresh file in a temporary directory. PostgreSQL
+is included when DB_HOST is configured and writes to DB_DATABASE, so point it at
+a scratch database.
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from backend.config.config import config
+from backend.dao.answer_dao import AnswerDao
+from backend.models.models import UserModel, ExamModel, StudentModel
+from backend.utils.db_conn import conn
+
+
+def _create_fixtures(threads: int):
+    """
+    Creates the user, exam and one student per thread the answers point to.
+    """
+    suffix = str(time.time_ns())
+    db = conn.get_db()
+    try:
+        user = UserModel(name="benchmark", email=f"benchmark-{suffix}@example.com", password="benchmark")
+        db.add(user)
+        db.flush()
+        exam = ExamModel(name="benchmark", conducted_date=date.today(), total_marks=100, user_id=user.id, answer_key=[], file_name="benchmark.pdf")
+        students = [
+            StudentModel(name=f"student {i}", roll_no=f"bench-{suffix}-{i}", email=f"student-{suffix}-{i}@example.com", user_id=user.id)
+            for i in range(threads)
+        ]
+        db.add(exam)
+        db.add_all(students)
+        db.commit()
+        return exam.id, [student.id for student in students]
+    finally:
+        db.close()
+
+
+def _run(db_url: str, answers: int, threads: int) -> float:
+    """
+    Inserts answers rows from threads concurrent writers and returns the answers written per second.
+    """
+    conn.setup_server(db_url=db_url)
+    try:
+        exam_id, student_ids = _create_fixtures(threads)
+        evaluation_details = [{"no": 1, "question": "q", "answer_key": "a", "student_answer": "a", "marks": 5, "justification": "ok"}]
+
+        def write(i: int) -> None:
+            AnswerDao().create_answer(
+                student_id=student_ids[i % threads],
+                exam_id=exam_id,
+                score=5.0,
+                confidence=0.0,
+                filename=f"answer-{i}.pdf",
+                evaluation_details=evaluation_details
+            )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(write, range(answers)))
+        return answers / (time.perf_counter() - start)
+    finally:
+        conn.close_all_connections()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=500, help="answers written per option")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent writers")
+    args = parser.parse_args()
+
+    sqlite_tuning = config.SQLITE_TUNING
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, tuning in (("sqlite, default journal", False), ("sqlite, WAL + pragmas", True)):
+            config.SQLITE_TUNING = tuning
+            db_url = f"sqlite:///{os.path.join(directory, name.split(',')[0] + str(tuning) + '.db')}"
+            results.append((name, _run(db_url, args.answers, args.threads)))
+        config.SQLITE_TUNING = sqlite_tuning
+
+    if config.DB_HOST:
+        config.DB_BACKEND = "postgresql"
+        results.append(("postgresql", _run(conn.build_db_url(), args.answers, args.threads)))
+
+    print(f"{args.answers} answers, {args.threads} concurrent writers")
+    for name, throughput in results:
+        print(f"  {name:<26} {throughput:8.1f} answers/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL
+from sqlalchemy import exc
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import QueuePool
 from sqlalchemy_utils import database_exists, create_database
 
 from backend.config.config import config
@@ -8,6 +17,69 @@ from backend.utils.errors import InternalServerError, DatabaseError
 
 Base = declarative_base()
 
+# The session of the request (or grading job) being served, see DBConn.session_scope
+_scoped_session: ContextVar[Optional[Session]] = ContextVar("scoped_session", default=None)
+
+
+class PoolStats:
+    """
+    Counters of connection pool checkouts, including how long they waited for a free connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waited_checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def record_wait(self, wait: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            # anything above a millisecond means the pool had no idle connection
+            if wait > 0.001:
+                self.waited_checkouts += 1
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+
+pool_stats = PoolStats()
+
+
+class MeteredQueuePool(QueuePool):
+    """
+    QueuePool that times every checkout into pool_stats.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record_timeout()
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    Tunes every new sqlite connection for concurrent grading writes.
+    """
+    cursor = dbapi_connection.cursor()
+    # journal_mode is stored in the database file, the other pragmas are per connection
+    cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+
 class DBConn:
     """
     A singleton class that provides a connection to a database using SQLAlchemy.
@@ -23,16 +95,53 @@ class DBConn:
         return cls._instance
 
     def __init__(self):
-        self._db_url = "sqlite:///mydatabase.db"
+        self._db_url = self.build_db_url()
+
+    def build_db_url(self) -> str:
+        """
+        Builds the engine URL of the DB_BACKEND selected in config.
+        """
+        if config.DB_BACKEND == "postgresql":
+            return URL.create(
+                "postgresql+psycopg2",
+                username=config.DB_USERNAME,
+                password=config.DB_PASSWORD,
+                host=config.DB_HOST,
+                port=config.DB_PORT,
+                database=config.DB_DATABASE,
+            ).render_as_string(hide_password=False)
+        if config.DB_BACKEND == "sqlite":
+            return f"sqlite:///{config.SQLITE_PATH}"
+        raise InternalServerError(f"Unsupported DB_BACKEND: {config.DB_BACKEND}")
 
-    def setup_server(self) -> None:
+    def setup_server(self, db_url: Optional[str] = None) -> None:
         """
         Sets up the database connection and creates the database if it does not exist.
+
+        db_url overrides the URL built from config, e.g. for a benchmark database.
         """
-        self._engine = create_engine(self._db_url, connect_args={}, future=True)
+        if db_url is not None:
+            self._db_url = db_url
+        connect_args = {}
+        if self._db_url.startswith("sqlite"):
+            # pooled connections are handed to whichever threadpool thread serves the request
+            connect_args["check_same_thread"] = False
+        self._engine = create_engine(
+            self._db_url,
+            connect_args=connect_args,
+            poolclass=MeteredQueuePool,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+            future=True
+        )
+        if self._db_url.startswith("sqlite") and config.SQLITE_TUNING:
+            event.listen(self._engine, "connect", _apply_sqlite_pragmas)
         self._session_local = sessionmaker(autocommit=False, autoflush=False, bind=self._engine, future=True)
         self._create_db_if_not_exists()
-        self._create_all()
+        self._migrate()
 
     def _create_db_if_not_exists(self) -> None:
         """
@@ -45,11 +154,14 @@ class DBConn:
         except Exception as error:
             raise InternalServerError("There has been a problem in checking the connection for the db.") from error
 
-    def _create_all(self) -> None:
+    def _migrate(self) -> None:
         """
-        Creates all the tables in the database.
+        Creates all the tables in the database and brings tables created by
+        older versions of the models up to date.
         """
-        Base.metadata.create_all(bind=self._engine)
+        # imported here, the models themselves import Base from this module
+        from backend.utils.migrations import migrate
+        migrate(self._engine)
 
     def get_db_url(self) -> str:
         """
@@ -57,51 +169,126 @@ class DBConn:
         """
         return self._db_url
 
-    def get_db(self):
+    def get_db(self) -> Session:
         """
-        Returns a new database session.
+        Returns the session of the current request or job if there is one, a new session otherwise.
         """
-        try:from backend.config.config import config  # Correct import name
+        scoped_session = _scoped_session.get()
+        if scoped_session is not None:
+            return scoped_session
+        return self.new_session()
 
-Base = declarative_base()
+    def new_session(self) -> Session:
+        """
+        Returns a session of its own, outside any unit of work.
 
+        Used for writes that must outlive the request or job that makes them,
+        such as caches, grading checkpoints and job progress.
+        """
+        try:
+            db = self._session_local()
+            return db
+        except Exception as error:
+            raise DatabaseError("Error while connecting to database!!") from error
 
-class Database:
-    """
-    A singleton class that provides a connection to a database using SQLAlchemy.
-    """
+    def commit(self, db: Session) -> None:
+        """
+        Commits a DAO's writes, or only flushes them when db belongs to a unit
+        of work, which commits once at its end.
+        """
+        if db.info.get("scoped"):
+            db.flush()
+        else:
+            db.commit()
 
-    _instance = None
-    _db_url = config.DATABASE_URL  # Correct reference to the config object
-    _session_local = None
-    _engine = None
+    def rollback(self, db: Session) -> None:
+        """
+        Rolls back a failed DAO write. A unit of work is also marked rollback
+        only, so writes made earlier in the same request or job are not
+        committed at its end.
+        """
+        db.rollback()
+        if db.info.get("scoped"):
+            db.info["rollback_only"] = True
 
-    def __new__(cls):
+    def close(self, db: Session) -> None:
         """
-        Overrides __new__ method to implement the singleton pattern.
+        Closes a DAO's session, unless it belongs to a unit of work.
         """
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+        if not db.info.get("scoped"):
+            db.close()
 
-    def __init__(self):
+    def open_scope(self):
         """
-        Initializes a Database object with a database URL.
+        Opens a unit of work bound to the current context, see session_scope.
+
+        Returns the session and the token that unbind_scope takes.
         """
+        session = self.new_session()
+        session.info["scoped"] = True
+        return session, _scoped_session.set(session)
 
-    def setup_server(self):
+    @staticmethod
+    def unbind_scope(token) -> None:
         """
-        Sets up the database connection and creates the database if it does not exist.
+        Stops handing the session of a unit of work to new DAOs.
         """
-        self._engine = create_engine(self._db_url, future=True)
-        self._session_local = sessionmaker(autocommit=False, autoflush=False, bind=self._engine, future=True)
-        self._create_db_if_not_exists()
+        try:
+            _scoped_session.reset(token)
+        except ValueError:
+            # the scope was closed from a copy of the context it was opened in
+            _scoped_session.set(None)
 
+    @staticmethod
+    def end_scope(session: Session, failed: bool) -> None:
+        """
+        Commits a unit of work, or rolls it back if it failed or a DAO marked it
+        rollback only, and closes its session.
+        """
+        try:
+            if failed or session.info.get("rollback_only"):
+                session.rollback()
+            else:
+                session.commit()
+        finally:
+            session.close()
 
-            db = self._session_local()
-            return db
-        except Exception as error:
-            raise DatabaseError("Error while connecting to database!!") from error
+    @contextmanager
+    def session_scope(self) -> Iterator[Session]:
+        """
+        A unit of work: every DAO created inside shares one session, which is
+        committed at the end, rolled back on error and always closed. DAOs only
+        flush inside a scope, see commit, rollback and close.
+
+        The session is bound to the current context only, so threads started
+        inside (grader pools, batch workers) still get sessions of their own.
+        """
+        session, token = self.open_scope()
+        failed = False
+        try:
+            yield session
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.unbind_scope(token)
+            self.end_scope(session, failed)
+
+    def pool_metrics(self) -> dict:
+        """
+        Returns the current pool usage and the checkout counters.
+        """
+        pool = self._engine.pool if self._engine is not None else None
+        return {
+            "pool_size": pool.size() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "overflow": pool.overflow() if pool is not None else 0,
+            "checkouts": pool_stats.checkouts,
+            "waited_checkouts": pool_stats.waited_checkouts,
+            "average_wait": pool_stats.total_wait / pool_stats.checkouts if pool_stats.checkouts else 0.0,
+            "max_wait": pool_stats.max_wait,
+            "timeouts": pool_stats.timeouts,
+        }
 
     def close_all_connections(self) -> None:
         """
@@ -109,3 +296,6 @@ class Database:
         """
         if self._engine is not None:
             self._engine.dispose()
+
+
+conn = DBConn()
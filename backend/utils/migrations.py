@@ -0,0 +1,129 @@
+"""
+Versioned schema migrations for databases created by an older version of the models.
+
+migrate() starts with Base.metadata.create_all, which only creates missing
+tables, so columns and indexes added to existing tables have to be applied
+here. Every migration runs once, in version order, and is recorded in the
+schema_migrations table. Migrations are idempotent: on a new database
+create_all has already built the current schema and they only record themselves.
+
+To change the schema, update the model and append a migration to MIGRATIONS.
+
+Every API and worker process migrates on start, so migrate() holds a lock
+while it creates tables and applies migrations: an advisory lock on PostgreSQL and a lock file
+next to the database on SQLite.
+"""
+import fcntl
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+from sqlalchemy import inspect, select, insert, text
+from sqlalchemy.engine import Connection, Engine
+
+from backend.models.models import (
+    AnswerModel, ContextModel, ExamModel, GradingJobModel, SchemaMigrationModel, StudentModel
+)
+
+
+def _add_column(connection: Connection, model, column_name: str) -> None:
+    """
+    Adds a model column missing from its table, together with the column's own index.
+    """
+    table = model.__table__
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    if column_name in existing:
+        return
+    column = table.columns[column_name]
+    column_type = column.type.compile(dialect=connection.dialect)
+    definition = f'{column.name} {column_type}'
+    if column.server_default is not None:
+        # existing rows take the default, which also lets a NOT NULL column be added
+        definition += f' DEFAULT {column.server_default.arg}'
+        if not column.nullable:
+            definition += ' NOT NULL'
+    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {definition}')
+    for index in table.indexes:
+        if [indexed.name for indexed in index.columns] == [column_name]:
+            index.create(connection, checkfirst=True)
+
+
+def _create_indexes(connection: Connection, *models) -> None:
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _drop_index(connection: Connection, model, index_name: str) -> None:
+    """
+    Drops an index no longer declared by the model, if the table still has it.
+    """
+    existing = {index["name"] for index in inspect(connection).get_indexes(model.__table__.name)}
+    if index_name in existing:
+        connection.exec_driver_sql(f'DROP INDEX {index_name}')
+
+
+def _replace_answer_exam_index(connection: Connection) -> None:
+    # (exam_id, student_id) could not serve the id order of the answer pages
+    _drop_index(connection, AnswerModel, "ix_answers_exam_id_student_id")
+    _create_indexes(connection, AnswerModel)
+
+
+# (version, description, migration), append only
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Add contexts.content_hash", lambda connection: _add_column(connection, ContextModel, "content_hash")),
+    (2, "Add exams.retrieved_context", lambda connection: _add_column(connection, ExamModel, "retrieved_context")),
+    (3, "Index hot lookup columns of answers, exams, students, contexts and grading_jobs",
+        lambda connection: _create_indexes(connection, AnswerModel, ExamModel, StudentModel, ContextModel, GradingJobModel)),
+    (4, "Add grading_jobs.attempts", lambda connection: _add_column(connection, GradingJobModel, "attempts")),
+    (5, "Replace ix_answers_exam_id_student_id with ix_answers_exam_id_id", _replace_answer_exam_index),
+]
+
+# Key of the PostgreSQL advisory lock held while migrating
+MIGRATION_LOCK_KEY = 7410339
+
+
+@contextmanager
+def _migration_lock(engine: Engine) -> Iterator[None]:
+    """
+    Keeps other processes from migrating the same database at the same time.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            connection.commit()
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+                connection.commit()
+    elif engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        with open(f"{engine.url.database}.migrate.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+    else:
+        # an in-memory database is private to its process
+        yield
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    Creates missing tables, applies the migrations the database has not seen yet
+    and returns their versions.
+    """
+    with _migration_lock(engine):
+        # read under the lock, a process that held it before may have applied some already
+        SchemaMigrationModel.metadata.create_all(engine)
+        with engine.connect() as connection:
+            applied = set(connection.execute(select(SchemaMigrationModel.version)).scalars())
+
+        newly_applied = []
+        for version, description, migration in MIGRATIONS:
+            if version in applied:
+                continue
+            # each migration commits together with its record, a failed one is retried on next start
+            with engine.begin() as connection:
+                migration(connection)
+                connection.execute(insert(SchemaMigrationModel).values(version=version, description=description))
+            print(f"Applied schema migration {version}: {description}")
+            newly_applied.append(version)
+    return newly_applied
@@ -0,0 +1,16 @@
+from typing import Optional
+
+
+def keyset_page(query, id_column, after_id: Optional[int] = None, limit: Optional[int] = None):
+    """
+    Restricts a query to the rows after the after_id cursor, in id order.
+
+    Unlike OFFSET, the database seeks straight to the cursor, so every page
+    costs the same however deep it is. Without limit every remaining row is returned.
+    """
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    query = query.order_by(id_column)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
@@ -0,0 +1,144 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Tuple, Union
+
+import pdfplumber
+from langchain.docstore.document import Document
+
+from backend.config.config import config
+
+PdfSource = Union[str, bytes]
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _open(source: PdfSource):
+    return pdfplumber.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _extract_pages(source: PdfSource, start: int, end: int) -> List[Tuple[str, float]]:
+    """
+    Extracts the text of pages [start, end) and how long each page took.
+    """
+    pages = []
+    with _open(source) as pdf:
+        for page in pdf.pages[start:end]:
+            started = time.perf_counter()
+            # extract_text returns None for pages without a text layer (e.g. scans)
+            text = page.extract_text() or ""
+            pages.append((text, time.perf_counter() - started))
+    return pages
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # the pool is started from threadpool threads of the server, forking a
+            # multi-threaded process can deadlock the child, as in grading_worker
+            _pool = ProcessPoolExecutor(max_workers=config.PDF_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """
+    Stops the extraction worker processes, they are started again on the next parallel extraction.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def iter_page_timings(source: PdfSource) -> Iterator[Tuple[str, float]]:
+    """
+    Yields (text, seconds) for every page in order.
+
+    Small documents are extracted in process, larger ones are split into page
+    ranges that are extracted in parallel by the worker processes. Pages are
+    yielded as soon as their range is done, so callers can start on the first
+    pages while the rest are still being extracted.
+    """
+    with _open(source) as pdf:
+        page_count = len(pdf.pages)
+
+    if page_count < config.PDF_PARALLEL_MIN_PAGES or config.PDF_EXTRACT_WORKERS <= 1:
+        yield from _extract_pages(source, 0, page_count)
+        return
+
+    pages_per_task = max(1, -(-page_count // (config.PDF_EXTRACT_WORKERS * 2)))
+    ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+    # every task would pickle the whole document, so in-memory bytes are written
+    # to a temporary file once and the tasks only get its path
+    temp_path = None
+    if isinstance(source, bytes):
+        with tempfile.NamedTemporaryFile(prefix="extract_", suffix=".pdf", delete=False) as temp_file:
+            temp_file.write(source)
+        source = temp_path = temp_file.name
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(_extract_pages, source, start, end) for start, end in ranges]
+        for future in futures:
+            yield from future.result()
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+
+def iter_page_texts(source: PdfSource) -> Iterator[str]:
+    """
+    Yields the text of every page in order.
+    """
+    for text, _ in iter_page_timings(source):
+        yield text
+
+
+def _log_timings(name: str, timings: List[float], started: float) -> None:
+    if not timings:
+        return
+    slowest = max(range(len(timings)), key=timings.__getitem__)
+    breakdown = ", ".join(f"{seconds:.3f}" for seconds in timings)
+    print(f"PDF extraction {name}: {len(timings)} pages in {time.perf_counter() - started:.3f}s, "
+          f"slowest page {slowest + 1} ({timings[slowest]:.3f}s), per page [{breakdown}]")
+
+
+def extract_text(source: PdfSource, name: str = "") -> str:
+    """
+    Returns the text of the whole document and logs a per-page timing breakdown.
+
+    Args:
+        source (PdfSource): Path of the PDF or its raw bytes.
+        name (str): Name used in the log line, usually the uploaded file name.
+    """
+    started = time.perf_counter()
+    texts, timings = [], []
+    for text, seconds in iter_page_timings(source):
+        texts.append(text)
+        timings.append(seconds)
+    _log_timings(name, timings, started)
+    # a page break ends a line, so a question number at the top of a page still starts one
+    return "\n".join(texts)
+
+
+def extract_documents(source: PdfSource, name: str = "") -> List[Document]:
+    """
+    Returns one langchain Document per page, the shape PyPDFLoader produced for reference contexts.
+
+    Args:
+        source (PdfSource): Path of the PDF or its raw bytes.
+        name (str): Stored as the source of every page and used in the timing log line.
+    """
+    started = time.perf_counter()
+    documents, timings = [], []
+    for page, (text, seconds) in enumerate(iter_page_timings(source)):
+        documents.append(Document(page_content=text, metadata={"source": name, "page": page}))
+        timings.append(seconds)
+    _log_timings(name, timings, started)
+    return documents
@@ -0,0 +1,106 @@
+import io
+import os
+import resource
+import tempfile
+from typing import BinaryIO, Union
+
+from fastapi import UploadFile
+
+from backend.config.config import config
+
+
+class SpooledUpload:
+    """
+    Holds an uploaded file in memory until it grows past UPLOAD_SPOOL_MAX_MEMORY,
+    then moves it to a temporary file on disk.
+
+    source is what the PDF extractor accepts: the bytes while the upload is small,
+    the path of the temporary file once it has been spooled to disk.
+    """
+
+    def __init__(self, name: str, max_memory: int = None):
+        self.name = name
+        self.size = 0
+        # the most bytes this upload held in memory, at most max_memory
+        self.peak_memory = 0
+        self._max_memory = config.UPLOAD_SPOOL_MAX_MEMORY if max_memory is None else max_memory
+        self._buffer = io.BytesIO()
+        self._file = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self._file is not None
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        if self.on_disk:
+            self._file.flush()
+            return self._file.name
+        return self._buffer.getvalue()
+
+    @property
+    def file(self) -> BinaryIO:
+        """
+        The spooled content as a file object positioned at the start.
+        """
+        target = self._file if self.on_disk else self._buffer
+        target.flush()
+        target.seek(0)
+        return target
+
+    def write(self, chunk: bytes) -> None:
+        if not self.on_disk and self.size + len(chunk) > self._max_memory:
+            self._file = tempfile.NamedTemporaryFile(prefix="upload_", suffix=os.path.splitext(self.name)[1], delete=False)
+            self._file.write(self._buffer.getvalue())
+            self._buffer = None
+        (self._file if self.on_disk else self._buffer).write(chunk)
+        self.size += len(chunk)
+        if not self.on_disk:
+            self.peak_memory = self.size
+
+    def close(self) -> None:
+        # ru_maxrss is the high-water mark of the whole process since it started
+        # (KiB on Linux), peak_memory is what this upload itself held
+        process_peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"Upload {self.name}: {self.size} bytes {'spooled to disk' if self.on_disk else 'kept in memory'}, "
+              f"peak in memory {self.peak_memory} bytes, process peak RSS {process_peak_rss:.1f} MB")
+        if self.on_disk:
+            self._file.close()
+            os.remove(self._file.name)
+        self._file = None
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def spool_upload(file: UploadFile) -> SpooledUpload:
+    """
+    Streams an uploaded file in UPLOAD_CHUNK_SIZE chunks into a SpooledUpload.
+    """
+    spooled = SpooledUpload(file.filename)
+    try:
+        while chunk := await file.read(config.UPLOAD_CHUNK_SIZE):
+            spooled.write(chunk)
+    except BaseException:
+        # the caller never gets the upload to close, so its temporary file is removed here
+        spooled.close()
+        raise
+    return spooled
+
+
+def spool_stream(name: str, stream: BinaryIO) -> SpooledUpload:
+    """
+    Streams a file object (e.g. a zip member) in UPLOAD_CHUNK_SIZE chunks into a SpooledUpload.
+    """
+    spooled = SpooledUpload(name)
+    try:
+        while chunk := stream.read(config.UPLOAD_CHUNK_SIZE):
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+    return spooled
@@ -0,0 +1,96 @@
+import fcntl
+import multiprocessing
+import os
+import time
+
+from backend.config.config import config
+from backend.core.grading_job_core import GradingJobCore
+from backend.dao.grading_job_dao import GradingJobDao
+from backend.utils.db_conn import conn
+
+
+def _worker_loop(stop_event) -> None:
+    """
+    Entry point of a grading worker process: poll the job table until told to stop.
+    """
+    # spawned processes start from a fresh interpreter, so they need their own engine
+    conn.setup_server()
+
+    try:
+        while not stop_event.is_set():
+            try:
+                # run_next_job opens the unit of work of each job itself
+                processed = GradingJobCore().run_next_job()
+            except Exception as error:
+                print(error)
+                processed = False
+            if not processed:
+                stop_event.wait(config.GRADING_POLL_INTERVAL)
+    finally:
+        conn.close_all_connections()
+
+
+class GradingWorkerPool:
+    """
+    Runs the worker processes that consume the SQLite backed grading job queue.
+
+    Every uvicorn worker calls start(), but only the process holding the lock
+    file in GRADING_JOB_DIR runs the pool. Otherwise each start would requeue the
+    jobs the owner's workers are still running.
+    """
+
+    def __init__(self, no_of_workers: int = None):
+        self.no_of_workers = config.GRADING_WORKERS if no_of_workers is None else no_of_workers
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self._processes = []
+        self._lock_file = None
+
+    def start(self) -> None:
+        """
+        Requeues jobs interrupted by a previous shutdown and starts the workers,
+        unless another process already owns the pool.
+        """
+        if not self._acquire_ownership():
+            print("Grading workers are run by another process")
+            return
+
+        requeued = GradingJobDao().requeue_running_jobs()
+        if requeued:
+            print(f"Requeued {requeued} interrupted grading jobs")
+
+        for _ in range(self.no_of_workers):
+            process = self._context.Process(target=_worker_loop, args=(self._stop_event,), daemon=True)
+            process.start()
+            self._processes.append(process)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Signals the workers to stop after their current job and waits for them.
+        """
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        if self._lock_file is not None:
+            # closing the file releases the lock for the next owner
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _acquire_ownership(self) -> bool:
+        os.makedirs(config.GRADING_JOB_DIR, exist_ok=True)
+        lock_file = open(os.path.join(config.GRADING_JOB_DIR, "workers.lock"), "w")
+        try:
+            # held until stop() or until this process exits, even if it crashes
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+
+grading_workers = GradingWorkerPool()
@@ -2,10 +2,9 @@
 from backend.core.student_core import StudentCore
 from frontend.side_bar import render_side_bar
 from backend.core.answer_core import AnswerCore
-import pdfplumber
+from backend.utils.pdf_extractor import extract_text
 import streamlit as st
 import pandas as pd
-import io
 
 # Constants
 HOST_NAME = "http://localhost:8000"
@@ -109,11 +108,10 @@ def add_evaluation(json_data, file_upload):
     answer_core = AnswerCore()
     pdf_data = file_upload.read()
 
-    with pdfplumber.open(io.BytesIO(pdf_data)) as pdf:
-        answer_pdf = "".join(page.extract_text() for page in pdf.pages)
+    answer_pdf = extract_text(pdf_data, name=filename)
 
     with st.spinner("Uploading evaluation details..."):
-        answer_core.create_answer(input=json_data, answer_pdf=pdf_data, filename=filename)
+        answer_core.create_answer(input=json_data, answer_pdf=answer_pdf, filename=filename)
         st.success("Answer added successfully.")
         st.experimental_rerun()
 
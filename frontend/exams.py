@@ -1,11 +1,11 @@
 # Importing necessary modules
 from datetime import datetime
 import pandas as pd
-import pdfplumber
 import streamlit as st
 
 from backend.core.context_core import ContextCore
 from backend.core.exam_core import ExamCore
+from backend.utils.pdf_extractor import extract_text
 import frontend.redirect as rd
 from frontend.css.input import input_css
 from frontend.side_bar import render_side_bar
@@ -71,8 +71,7 @@ def add_exam(json_data, file_upload):
 
     with st.spinner("Uploading exam details..."):
         try:
-            with pdfplumber.open(io.BytesIO(file_upload.getvalue())) as pdf:
-                pdf_text = "".join(page.extract_text() for page in pdf.pages)
+            pdf_text = extract_text(file_upload.getvalue(), name=file_upload.name)
 
             exam_core.create_exam(input=json_data, answer_key=pdf_text, filename=file_upload.name)
         except Exception as error:
@@ -3,8 +3,7 @@ import frontend.redirect as rd
 import pandas as pd
 from frontend.side_bar import render_side_bar
 from backend.core.context_core import ContextCore
-import tempfile
-from langchain.document_loaders import PyPDFLoader
+from backend.utils.pdf_extractor import extract_documents
 
 
 def create_references():
@@ -115,17 +114,7 @@ def add_references_function(json_data, uploaded_file):
     context_pdf = None
         
     with st.spinner("Uploading Reference details..."):
-        with tempfile.NamedTemporaryFile(delete=True) as temp_file:
-
-            file_contents = uploaded_file.read()
-
-            temp_file.write(file_contents)
-            temp_file.flush()
-
-            temp_file_path = temp_file.name
-            
-            loader = PyPDFLoader(temp_file_path)
-            context_pdf = loader.load()
+        context_pdf = extract_documents(uploaded_file.read(), name=uploaded_file.name)
         
         try:
             reference = reference_core.create_context(input=json_data, filename=uploaded_file.name, context_pdf=context_pdf)
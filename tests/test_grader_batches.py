@@ -0,0 +1,59 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("cohere")
+pytest.importorskip("langchain")
+pytest.importorskip("weaviate")
+
+from backend.config.config import config
+from backend.rag_models import grader as grader_module
+
+
+class FakeCohere:
+    """
+    Answers the batch prompt with the given replies, then every single-question prompt with 3 marks.
+    """
+
+    def __init__(self, batch_reply):
+        self.batch_reply = batch_reply
+        self.prompts = []
+
+    def generate(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        if len(self.prompts) == 1:
+            text = json.dumps(self.batch_reply)
+        else:
+            text = json.dumps({"Marks": 3, "Justification": "graded alone"})
+        return SimpleNamespace(generations=[SimpleNamespace(text=text)])
+
+
+@pytest.fixture
+def grader(monkeypatch):
+    cohere_client = FakeCohere([
+        {"Item": 1, "Marks": 5, "Justification": "correct"},
+        {"Item": 3, "Marks": 1, "Justification": "mostly wrong"},
+    ])
+    monkeypatch.setattr(grader_module, "clients", SimpleNamespace(
+        get_cohere_client=lambda: cohere_client,
+        get_weaviate_client=lambda: None,
+    ))
+    monkeypatch.setattr(grader_module, "cohere_limiter", SimpleNamespace(call=lambda fn, tokens=0: fn()))
+    monkeypatch.setattr(config, "GRADE_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "GRADER_BATCH_SIZE", 3)
+    return grader_module.GraderCohere(None)
+
+
+def test_items_missing_from_the_batch_reply_are_regraded(grader):
+    items = [{"question": f"Q{no}", "answer_key": f"K{no}", "student_answer": f"A{no}"} for no in range(1, 4)]
+
+    graded, total = grader.grade(items)
+
+    assert [item["marks"] for item in graded] == [5, 3, 1]
+    assert total == 9.0
+    # one prompt for the batch and one for the item missing from its reply
+    assert len(grader.chain.prompts) == 2
+    totals = grader.batch_totals()
+    assert (totals["batches"], totals["items"], totals["regraded"]) == (1, 3, 1)
+    assert totals["prompt_tokens"] > 0 and totals["response_tokens"] > 0
@@ -0,0 +1,81 @@
+"""
+Every read endpoint, and the grading read of an exam, should cost a single
+SELECT however many answers or exams it returns.
+
+The DAOs run against a scratch SQLite database and a before_cursor_execute
+listener counts the statements they send.
+"""
+import pytest
+from sqlalchemy import event
+
+from backend.dao.answer_dao import AnswerDao
+from backend.dao.context_dao import ContextDao
+from backend.dao.exam_dao import ExamDao
+from backend.dao.student_dao import StudentDao
+from backend.dao.user_dao import UserDao
+from backend.utils.db_conn import conn
+
+
+@pytest.fixture
+def seeded(tmp_path):
+    conn.setup_server(db_url=f"sqlite:///{tmp_path / 'scratch.db'}")
+    user = UserDao().create_user("Teacher", "teacher@example.com", "secret")
+    context = ContextDao().create_context("Biology", "", user.id, "CONTEXTScratch", "biology.pdf", content_hash="hash")
+    exam_ids = [
+        ExamDao().create_exam(f"Exam {no}", "2024-01-01", "", 10.0, user.id, context.id, "key.pdf", [{"no": 1}]).id
+        for no in range(3)
+    ]
+    answer_ids = []
+    for no in range(5):
+        student = StudentDao().create_student(f"Student {no}", f"R{no}", f"student{no}@example.com", user.id)
+        answer = AnswerDao().create_answer(student.id, exam_ids[0], 5.0, 0.0, f"script{no}.pdf", [])
+        answer_ids.append(answer.id)
+    yield {"user_id": user.id, "exam_id": exam_ids[0], "answer_id": answer_ids[0]}
+    conn.close_all_connections()
+
+
+@pytest.fixture
+def selects():
+    statements = []
+
+    def count(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    event.listen(conn._engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(conn._engine, "before_cursor_execute", count)
+
+
+def test_get_answer_by_id(seeded, selects):
+    answer = AnswerDao().get_answer_by_id(seeded["answer_id"])
+    assert answer.student_name == "Student 0"
+    assert answer.max_exam_score == 10.0
+    assert len(selects) == 1
+
+
+def test_get_answers_by_exam_id(seeded, selects):
+    answers = AnswerDao().get_answers_by_exam_id(seeded["exam_id"])
+    assert [answer.student_roll_no for answer in answers] == [f"R{no}" for no in range(5)]
+    assert len(selects) == 1
+
+
+def test_get_exam_by_id(seeded, selects):
+    exam = ExamDao().get_exam_by_id(seeded["exam_id"])
+    assert exam.name == "Exam 0"
+    # the answer key and retrieved passages are only read for grading
+    assert "answer_key" not in exam._fields and "retrieved_context" not in exam._fields
+    assert len(selects) == 1
+
+
+def test_get_exam_for_grading(seeded, selects):
+    exam, context_key = ExamDao().get_exam_for_grading(seeded["exam_id"])
+    assert exam.answer_key == [{"no": 1}]
+    assert context_key == "CONTEXTScratch"
+    assert len(selects) == 1
+
+
+def test_get_exams_by_user_id(seeded, selects):
+    exams = ExamDao().get_exams_by_user_id(seeded["user_id"], limit=2)
+    assert [exam.name for exam in exams] == ["Exam 0", "Exam 1"]
+    assert len(selects) == 1
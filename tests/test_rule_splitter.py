@@ -0,0 +1,30 @@
+from backend.rag_models.rule_splitter import RuleBasedSplitter
+
+
+def test_questions_and_answers_are_told_apart():
+    text = (
+        "1. What is osmosis?\nMovement of water across a membrane.\n"
+        "2. What is Ohm's law?\nVoltage is current times resistance.\n"
+    )
+    items, confidence = RuleBasedSplitter().split(text)
+    assert [(item["no"], item["question"]) for item in items] == [(1, "What is osmosis?"), (2, "What is Ohm's law?")]
+    assert items[1]["answer"] == "Voltage is current times resistance."
+    assert confidence == 1.0
+
+
+def test_answers_only_script_is_trusted():
+    text = "1. Movement of water across a membrane.\n2. Voltage is current times resistance.\n"
+    items, confidence = RuleBasedSplitter().split(text)
+    assert [item["question"] for item in items] == ["", ""]
+    assert confidence == 1.0
+
+
+def test_instruction_questions_are_left_to_the_llm():
+    # no "?" or "Answer:" marker, so each instruction would be merged into its answer
+    text = (
+        "1. Define osmosis.\nMovement of water across a membrane.\n"
+        "2. State Ohm law.\nVoltage is current times resistance.\n"
+    )
+    items, confidence = RuleBasedSplitter().split(text)
+    assert [item["question"] for item in items] == ["", ""]
+    assert confidence == 0.0
@@ -0,0 +1,30 @@
+import pytest
+
+from backend.dao.grading_checkpoint_dao import GradingCheckpointDao
+from backend.dao.student_dao import StudentDao
+from backend.dao.exam_dao import ExamDao
+from backend.dao.user_dao import UserDao
+from backend.models.models import GradingCheckpointModel
+from backend.utils.db_conn import conn
+
+
+@pytest.fixture
+def scratch_db(tmp_path):
+    conn.setup_server(db_url=f"sqlite:///{tmp_path / 'scratch.db'}")
+    yield
+    conn.close_all_connections()
+
+
+def test_delete_student_deletes_their_checkpoints(scratch_db):
+    user = UserDao().create_user("Teacher", "teacher@example.com", "secret")
+    exam = ExamDao().create_exam("Exam", "2024-01-01", "", 10.0, user.id, None, "key.pdf", None)
+    student = StudentDao().create_student("Student", "R1", "student@example.com", user.id)
+    GradingCheckpointDao().put_checkpoint(exam.id, student.id, 1, "hash", {"Marks": 1})
+
+    assert StudentDao().delete_student(student.id)
+
+    db = conn.new_session()
+    try:
+        assert db.query(GradingCheckpointModel).count() == 0
+    finally:
+        db.close()
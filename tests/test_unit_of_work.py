@@ -0,0 +1,41 @@
+"""
+A unit of work commits its DAO writes together, or none of them.
+"""
+import pytest
+
+from backend.dao.user_dao import UserDao
+from backend.models.models import UserModel
+from backend.utils.db_conn import conn
+from backend.utils.errors import DuplicateError
+
+
+@pytest.fixture
+def scratch_db(tmp_path):
+    conn.setup_server(db_url=f"sqlite:///{tmp_path / 'scratch.db'}")
+    yield
+    conn.close_all_connections()
+
+
+def user_emails():
+    db = conn.new_session()
+    try:
+        return sorted(email for (email,) in db.query(UserModel.email))
+    finally:
+        db.close()
+
+
+def test_writes_commit_at_the_end_of_the_scope(scratch_db):
+    with conn.session_scope():
+        UserDao().create_user("First", "first@example.com", "secret")
+        UserDao().create_user("Second", "second@example.com", "secret")
+        assert user_emails() == []
+    assert user_emails() == ["first@example.com", "second@example.com"]
+
+
+def test_failed_write_rolls_back_the_whole_scope(scratch_db):
+    UserDao().create_user("Existing", "existing@example.com", "secret")
+    with conn.session_scope():
+        UserDao().create_user("New", "new@example.com", "secret")
+        with pytest.raises(DuplicateError):
+            UserDao().create_user("Copy", "existing@example.com", "secret")
+    assert user_emails() == ["existing@example.com"]